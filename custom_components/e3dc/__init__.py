@@ -1,23 +1,100 @@
+import logging
+
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+from pymodbus.exceptions import ModbusException
 
+from . import external_statistics, services, websocket_api
+from .api import sunspec
+from .api.server import ModbusTcpServer
+from .const import (
+    CONF_PROXY_HOST,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_MAX_AGE,
+    DOMAIN,
+)
 from .coordinator import E3dcConfigEntry, E3dcCoordinator
+from .metrics import E3dcMetricsView
+
+_LOGGER = logging.getLogger(__name__)
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
 PLATFORMS = [
+    Platform.NUMBER,
     Platform.SENSOR,
 ]
 
 
+async def async_setup(hass: HomeAssistant, _config: ConfigType) -> bool:
+    services.async_setup(hass)
+    websocket_api.async_setup(hass)
+    hass.http.register_view(E3dcMetricsView())
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: E3dcConfigEntry) -> bool:
     coordinator = E3dcCoordinator(hass, entry)
     await coordinator.async_config_entry_first_refresh()
 
     entry.runtime_data = coordinator
 
+    if proxy_port := entry.options.get(CONF_PROXY_PORT):
+        await _async_start_proxy(entry, coordinator, int(proxy_port))
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
     return True
 
 
+async def _async_start_proxy(
+    entry: E3dcConfigEntry, coordinator: E3dcCoordinator, port: int
+) -> None:
+    """Serve other local Modbus clients from the registers the coordinator polls.
+
+    The entry is set up without the proxy if it can't listen on the port.
+    """
+    host = entry.options.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST)
+    max_age = entry.options.get(CONF_PROXY_MAX_AGE, DEFAULT_PROXY_MAX_AGE)
+
+    async def read_registers(address: int, count: int) -> list[int]:
+        if not coordinator.connected:
+            # Reconnecting, e.g. after the host changed.
+            msg = "Not connected to the device"
+            raise ModbusException(msg)
+        return await coordinator.client.read_registers_cached(address, count, max_age)
+
+    proxy = ModbusTcpServer(
+        read_registers, range(sunspec.BASE_ADDRESS, sunspec.ADDRESS_SPACE)
+    )
+    try:
+        await proxy.start(host, port)
+    except OSError as err:
+        _LOGGER.warning(
+            "Not serving the Modbus proxy, can't listen on %s:%d: %s", host, port, err
+        )
+        return
+    entry.async_on_unload(proxy.stop)
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: E3dcConfigEntry) -> None:
+    coordinator = entry.runtime_data
+    if entry.options != coordinator.options:
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    if coordinator.host_changed:
+        # The device was rediscovered at another address.
+        await coordinator.async_request_refresh()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: E3dcConfigEntry) -> bool:
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: E3dcConfigEntry) -> None:
+    await external_statistics.async_remove(hass, entry.entry_id)
@@ -0,0 +1,99 @@
+"""Minimal Modbus TCP server that only answers read holding registers requests."""
+
+import asyncio
+import logging
+import struct
+from collections.abc import Awaitable, Callable
+
+from pymodbus.exceptions import ModbusException
+
+_LOGGER = logging.getLogger(__name__)
+
+# MBAP header: transaction id, protocol id, length and unit id.
+_MBAP = struct.Struct(">HHHB")
+_READ_REQUEST = struct.Struct(">HH")
+
+# Length field of the MBAP header, the unit ID and a PDU of at most 253 bytes.
+_MIN_LENGTH = 2
+_MAX_LENGTH = 254
+
+_READ_HOLDING_REGISTERS = 0x03
+_MAX_READ_COUNT = 125
+
+_ILLEGAL_FUNCTION = 0x01
+_ILLEGAL_DATA_ADDRESS = 0x02
+_ILLEGAL_DATA_VALUE = 0x03
+_SERVER_DEVICE_FAILURE = 0x04
+
+type ReadRegisters = Callable[[int, int], Awaitable[list[int]]]
+
+
+class ModbusTcpServer:
+    def __init__(self, read: ReadRegisters, addresses: range = range(0x10000)) -> None:
+        self._read = read
+        # Requests outside of these addresses aren't passed on to `read`.
+        self._addresses = addresses
+        self._server: asyncio.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None  # noqa: S101
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str | None, port: int) -> None:
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in self._connections:
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(_MBAP.size)
+                transaction, protocol, length, unit = _MBAP.unpack(header)
+                if not _MIN_LENGTH <= length <= _MAX_LENGTH:
+                    # Without a valid length, the next frame can't be found.
+                    _LOGGER.debug("Dropping connection after invalid length %d", length)
+                    break
+                pdu = await reader.readexactly(length - 1)
+                response = await self._respond(pdu)
+                writer.write(
+                    _MBAP.pack(transaction, protocol, 1 + len(response), unit)
+                    + response
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _respond(self, pdu: bytes) -> bytes:
+        function = pdu[0]
+        if function != _READ_HOLDING_REGISTERS:
+            return bytes((function | 0x80, _ILLEGAL_FUNCTION))
+        if len(pdu) != 1 + _READ_REQUEST.size:
+            return bytes((function | 0x80, _ILLEGAL_DATA_VALUE))
+
+        address, count = _READ_REQUEST.unpack_from(pdu, 1)
+        if not 1 <= count <= _MAX_READ_COUNT:
+            return bytes((function | 0x80, _ILLEGAL_DATA_VALUE))
+        if address not in self._addresses or address + count > self._addresses.stop:
+            return bytes((function | 0x80, _ILLEGAL_DATA_ADDRESS))
+
+        try:
+            registers = await self._read(address, count)
+        except (ModbusException, OSError) as err:
+            _LOGGER.debug("Reading %d registers at %d failed: %s", count, address, err)
+            return bytes((function | 0x80, _SERVER_DEVICE_FAILURE))
+        return struct.pack(f">BB{count}H", function, 2 * count, *registers)
@@ -1,48 +1,254 @@
+import array
+import asyncio
+import copy
 import dataclasses
 import enum
+import functools
+import re
 import struct
-from typing import Any, Self, override
+import time
+import urllib.parse
+from collections.abc import Buffer, Iterable, Sequence
+from typing import Any, ClassVar, Literal, Self, override
 
 from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+MODBUS_PORT = 502
+# Address of the "SunS" marker at the start of the register map.
+BASE_ADDRESS = 40000
+# Number of addressable registers.
+ADDRESS_SPACE = 0x10000
+# Model ID in the header after the last model of the register map.
+END_MODEL_ID = 0xFFFF
+# Maximum number of registers a single read holding registers request may return.
+MAX_READ_COUNT = 125
+# Unused registers that may be read to merge two ranges into a single request. Reading
+# a few extra registers is much cheaper than another round trip.
+_MAX_READ_GAP = 32
+
+# Register values a SunSpec device uses for "not implemented" points: 0x8000 for
+# int16/sunssf, 0xFFFF for uint16/enum16 and 0x0000 for accumulators. A block made up
+# only of these values means the model isn't backed by any hardware.
+_NOT_IMPLEMENTED_REGISTERS = frozenset({0x0000, 0x8000, 0xFFFF})
+
+_FORMAT_ITEM = re.compile(r"(\d*)([a-zA-Z?])")
+
+type Block = Literal[
+    "common", "storage", "li_battery", "inverter", "mppt", "root_meter", "extra_meter"
+]
+type RegisterRange = tuple[int, int]
+
+
+def split_host(host: str) -> tuple[str, int]:
+    """Split an optional port off a host, e.g. `192.0.2.1:1502` or `[::1]:1502`."""
+    if host.count(":") != 1 and not host.startswith("["):
+        # No port, which includes bare IPv6 addresses.
+        return host, MODBUS_PORT
+    url = urllib.parse.urlsplit(f"//{host}")
+    return url.hostname or host, url.port or MODBUS_PORT
+
+
+def is_not_implemented(registers: Sequence[int]) -> bool:
+    return all(reg in _NOT_IMPLEMENTED_REGISTERS for reg in registers)
+
+
+def coalesce_ranges(ranges: Iterable[RegisterRange]) -> list[RegisterRange]:
+    """Merge `(address, count)` ranges into as few requests as possible."""
+    merged: list[RegisterRange] = []
+    for address, count in sorted(ranges):
+        if merged:
+            start, prev_count = merged[-1]
+            end = max(start + prev_count, address + count)
+            if address <= start + prev_count + _MAX_READ_GAP and (
+                end - start <= MAX_READ_COUNT
+            ):
+                merged[-1] = (start, end - start)
+                continue
+        merged.extend(
+            (chunk, min(MAX_READ_COUNT, address + count - chunk))
+            for chunk in range(address, address + count, MAX_READ_COUNT)
+        )
+    return merged
+
+
+class RegisterMapError(Exception):
+    """The register map doesn't have the layout the models expect."""
+
+
+class _Enum(enum.IntEnum):
+    """Enum that keeps values it doesn't define instead of raising `ValueError`.
+
+    Such a value becomes a pseudo member named `UNKNOWN_<value>`, which isn't part of
+    `__members__`.
+    """
+
+    @classmethod
+    @override
+    def _missing_(cls, value: object) -> Self | None:
+        if not isinstance(value, int):
+            return None
+        member = int.__new__(cls, value)
+        member._name_ = f"UNKNOWN_{value}"
+        member._value_ = value
+        return member
 
 
 class _Model:
-    def __init_subclass__(cls, struct: struct.Struct) -> None:
+    # Maps fields to the scale factor field that applies to them.
+    SCALE_FACTORS: ClassVar[dict[str, str]] = {}
+
+    def __init_subclass__(cls, struct: struct.Struct | None = None) -> None:
         super().__init_subclass__()
-        cls.STRUCT = struct
+        if struct is not None:
+            cls.STRUCT = struct
 
     @classmethod
     def unpack(cls, data: bytes) -> Self:
-        return cls(*cls.STRUCT.unpack(data))
+        return cls.unpack_from(data)
+
+    @classmethod
+    def unpack_from(cls, buffer: Buffer, offset: int = 0) -> Self:
+        return cls(*cls.STRUCT.unpack_from(buffer, offset))
+
+    @classmethod
+    def unpack_many(cls, buffer: Buffer, offset: int, count: int) -> list[Self]:
+        return [
+            cls.unpack_from(buffer, offset + i * cls.STRUCT.size) for i in range(count)
+        ]
 
     @classmethod
     def unpack_registers(cls, registers: list[int]) -> Self:
         return cls.unpack(b"".join(reg.to_bytes(2, "big") for reg in registers))
 
+    def scaled(self, field: str, scale_from: "_Model | None" = None) -> float:
+        """Value of the field with its scale factor applied.
+
+        Repeating blocks take their scale factors from the parent model, which has to
+        be passed as `scale_from`.
+        """
+        value = getattr(self, field)
+        if (sf := self.SCALE_FACTORS.get(field)) is None:
+            return value
+        return value * (10 ** getattr(scale_from or self, sf))
+
+    def unscaled(self, field: str, value: float) -> int:
+        """Register value that `scaled` turns into the value, rounded."""
+        if (sf := self.SCALE_FACTORS.get(field)) is not None:
+            value /= 10 ** getattr(self, sf)
+        return round(value)
+
     @classmethod
-    async def read(cls, client: AsyncModbusTcpClient, address: int) -> Self:
-        # Address calc: -1 because of 1-index and then +2 to skip the sunspec header.
-        resp = await client.read_holding_registers(
-            address + 1,
-            count=cls.STRUCT.size // 2,
-        )
-        return cls.unpack_registers(resp.registers)
+    def field_spans(cls) -> dict[str, RegisterRange]:
+        """Register offset and count of each field, relative to the block data."""
+        return _field_spans(cls)
 
     @classmethod
-    async def read_many(
-        cls, client: AsyncModbusTcpClient, address: int, count: int
-    ) -> list[Self]:
-        # Address calc: -1 because of 1-index and then +2 to skip the sunspec header.
-        resp = await client.read_holding_registers(
-            address + 1,
-            count=count * (cls.STRUCT.size // 2),
-        )
-        size_regs = cls.STRUCT.size // 2
+    def field_span(cls, field: str) -> RegisterRange:
+        return cls.field_spans()[field]
+
+    @classmethod
+    def value_fields(cls) -> list[str]:
+        """Fields in register order, without the scale factors."""
+        return _value_fields(cls)
+
+
+class RepeatingModel(_Model):
+    """Model with a fixed part followed by any number of repeating modules.
+
+    The number of modules follows from the block length. The decoded modules are
+    stored in the `MODULES` field and module fields are addressed as
+    `<MODULES>.<index>.<field>`, e.g. `strings.0.cur`.
+    """
+
+    MODULE: ClassVar[type[_Model]]
+    MODULES: ClassVar[str]
+
+    @classmethod
+    def module_count(cls, length: int) -> int:
+        return max(0, (2 * length - cls.STRUCT.size) // cls.MODULE.STRUCT.size)
+
+    @classmethod
+    @override
+    def field_span(cls, field: str) -> RegisterRange:
+        modules, sep, rest = field.partition(".")
+        if not sep or modules != cls.MODULES:
+            return super().field_span(field)
+
+        index, _, module_field = rest.partition(".")
+        offset, count = cls.MODULE.field_spans()[module_field]
+        module_size = cls.MODULE.STRUCT.size // 2
+        return (cls.STRUCT.size // 2 + int(index) * module_size + offset, count)
+
+    @override
+    def scaled(self, field: str, scale_from: _Model | None = None) -> float:
+        modules, sep, rest = field.partition(".")
+        if not sep or modules != self.MODULES:
+            return super().scaled(field, scale_from)
+
+        index, _, module_field = rest.partition(".")
+        return getattr(self, self.MODULES)[int(index)].scaled(module_field, self)
+
+    def module_value_fields(self) -> list[str]:
+        """Value fields of all modules, e.g. `strings.0.cur`."""
         return [
-            cls.unpack_registers(resp.registers[start : start + size_regs])
-            for start in range(0, len(resp.registers), size_regs)
+            f"{self.MODULES}.{index}.{field}"
+            for index in range(len(getattr(self, self.MODULES)))
+            for field in self.MODULE.value_fields()
         ]
 
+    @classmethod
+    def unpack_block(cls, buffer: Buffer, offset: int) -> Self:
+        """Unpack the block including its modules, starting at the length register."""
+        (length,) = struct.unpack_from(">H", buffer, offset)
+        this = cls.unpack_from(buffer, offset + 2)
+        modules = cls.MODULE.unpack_many(
+            buffer,
+            offset + 2 + cls.STRUCT.size,
+            cls.module_count(length),
+        )
+        object.__setattr__(this, cls.MODULES, modules)
+        return this
+
+
+def _decode_str(value: Any) -> Any:  # noqa: ANN401
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace").strip("\0")
+    return value
+
+
+@functools.cache
+def _value_fields(model: type[_Model]) -> list[str]:
+    scale_factors = set(model.SCALE_FACTORS.values())
+    if issubclass(model, RepeatingModel):
+        scale_factors.update(model.MODULE.SCALE_FACTORS.values())
+    return [field for field in model.field_spans() if field not in scale_factors]
+
+
+@functools.cache
+def _field_spans(model: type[_Model]) -> dict[str, RegisterRange]:
+    spans: list[RegisterRange] = []
+    offset = 0
+    for count, code in _FORMAT_ITEM.findall(model.STRUCT.format):
+        repeat = int(count or 1)
+        if code == "s":
+            # A string is a single field, the count is its length in bytes.
+            spans.append((offset, repeat // 2))
+            offset += repeat // 2
+            continue
+
+        size = struct.calcsize(f">{code}") // 2
+        spans.extend((offset + i * size, size) for i in range(repeat))
+        offset += repeat * size
+
+    names = [
+        field.name
+        for field in dataclasses.fields(model)
+        if field.default is dataclasses.MISSING
+        and field.default_factory is dataclasses.MISSING
+    ]
+    return dict(zip(names, spans, strict=True))
+
 
 # 1
 @dataclasses.dataclass(frozen=True)
@@ -56,26 +262,21 @@ class Common(_Model, struct=struct.Struct(">16s16s8s8s16sH")):
 
     @classmethod
     @override
-    def unpack(cls, data: bytes) -> Self:
-        def handle_str(v: Any) -> Any:  # noqa: ANN401
-            if isinstance(v, bytes):
-                return v.decode("utf-8", errors="replace").strip("\0")
-            return v
-
-        values = cls.STRUCT.unpack(data)
-        return cls(*map(handle_str, values))
+    def unpack_from(cls, buffer: Buffer, offset: int = 0) -> Self:
+        values = cls.STRUCT.unpack_from(buffer, offset)
+        return cls(*map(_decode_str, values))
 
 
 # 801
 @dataclasses.dataclass(frozen=True)
 class EnergyStorageBase(_Model, struct=struct.Struct(">H11HL3H4h")):
-    class DerTyp(enum.IntEnum):
+    class DerTyp(_Enum):
         STORAGE = 90
         BATTERY = 91
         LITHIUM_ION_BATTERY = 92
         REDOX_FLOW_BATTERY = 93
 
-    class ChaSt(enum.IntEnum):
+    class ChaSt(_Enum):
         OFF = 1
         EMPTY = 2
         DISCHARGING = 3
@@ -84,7 +285,7 @@ class EnergyStorageBase(_Model, struct=struct.Struct(">H11HL3H4h")):
         HOLDING = 6
         TESTING = 7
 
-    class LocRemCtl(enum.IntEnum):
+    class LocRemCtl(_Enum):
         REMOTE = 1
         LOCAL = 2
 
@@ -94,6 +295,18 @@ class EnergyStorageBase(_Model, struct=struct.Struct(">H11HL3H4h")):
         OVER_SOC_MAX_WARNING = 1 << 2
         OVER_SOC_MAX_ALARM = 1 << 3
 
+    SCALE_FACTORS: ClassVar[dict[str, str]] = {
+        "wh_rtg": "wh_rtg_sf",
+        "w_max_cha_rte": "w_max_cha_dis_cha_sf",
+        "w_max_dis_cha_rte": "w_max_cha_dis_cha_sf",
+        "dis_cha_rte": "dis_cha_rte_sf",
+        "soc": "soc_sf",
+    }
+    # Setpoints a remote controller may write.
+    CONTROLS: ClassVar[frozenset[str]] = frozenset(
+        {"w_max_cha_rte", "w_max_dis_cha_rte", "soc_np_max_pct", "soc_np_min_pct"}
+    )
+
     der_typ: DerTyp
     wh_rtg: int
     w_max_cha_rte: int
@@ -125,7 +338,7 @@ class EnergyStorageBase(_Model, struct=struct.Struct(">H11HL3H4h")):
 # 802
 @dataclasses.dataclass(frozen=True)
 class BatteryBase(_Model, struct=struct.Struct(">2HLH2L3HHh2H4h")):
-    class BatTyp(enum.IntEnum):
+    class BatTyp(_Enum):
         NOT_APPLICABLE_UNKNOWN = 0
         LEAD_ACID = 1
         NICKEL_METAL_HYDRATE = 2
@@ -139,7 +352,7 @@ class BatteryBase(_Model, struct=struct.Struct(">2HLH2L3HHh2H4h")):
         FLOW = 10
         OTHER = 99
 
-    class BatSt(enum.IntEnum):
+    class BatSt(_Enum):
         DISCONNECTED = 1
         INITIALIZING = 2
         CONNECTED = 3
@@ -170,23 +383,31 @@ class BatteryBase(_Model, struct=struct.Struct(">2HLH2L3HHh2H4h")):
         OTHER_ALARM = 1 << 20
         OTHER_WARNING = 1 << 21
 
-    class ReqPcsSt(enum.IntEnum):
+    class ReqPcsSt(_Enum):
         NO_REQUEST = 0
         START = 1
         STOP = 2
         UNSUPPORTED = 0xFFFF  # unofficial, used by E3DC
 
-    class SetOperation(enum.IntEnum):
+    class SetOperation(_Enum):
         CONNECT = 1
         DISCONNECT = 2
         UNSUPPORTED = 0xFFFF  # unofficial, used by E3DC
 
-    class SetPcsState(enum.IntEnum):
+    class SetPcsState(_Enum):
         STOPPED = 1
         STANDBY = 2
         STARTED = 3
         UNSUPPORTED = 0xFFFF  # unofficial, used by E3DC
 
+    SCALE_FACTORS: ClassVar[dict[str, str]] = {
+        "soh": "soh_sf",
+        "vol": "vol_sf",
+        "max_bat_a_cha": "max_bat_a_sf",
+        "max_bat_a_discha": "max_bat_a_sf",
+        "bat_req_w": "bat_req_w_sf",
+    }
+
     bat_typ: BatTyp
     bat_st: BatSt
     cycle_ct: int  # not set
@@ -220,7 +441,7 @@ class BatteryBase(_Model, struct=struct.Struct(">2HLH2L3HHh2H4h")):
 
 # 803
 @dataclasses.dataclass(frozen=True)
-class LithiumIonBattery(_Model, struct=struct.Struct(">5HhHhH3h4h")):
+class LithiumIonBattery(RepeatingModel, struct=struct.Struct(">5HhHhH3h4h")):
     @dataclasses.dataclass(frozen=True)
     class String(_Model, struct=struct.Struct(">3Hh3H2hHLLHH")):
         class Evt1(enum.IntFlag):
@@ -246,18 +467,28 @@ class LithiumIonBattery(_Model, struct=struct.Struct(">5HhHhH3h4h")):
             OTHER_WARNING = 1 << 19
             STRING_ENABLED = 1 << 20
 
-        class ConFail(enum.IntEnum):
+        class ConFail(_Enum):
             NO_FAILURE = 0
             BUTTON_PUSHED = 1
             STR_GROUND_FAULT = 2
             OUTSIDE_VOLTAGE_RANGE = 3
             UNSUPPORTED = 0xFFFF  # unofficial, used by E3DC
 
-        class SetEna(enum.IntEnum):
+        class SetEna(_Enum):
             ENABLE = 1
             DISABLE = 2
             UNSUPPORTED = 0xFFFF  # unofficial, used by E3DC
 
+        # The scale factors are fields of the battery.
+        SCALE_FACTORS: ClassVar[dict[str, str]] = {
+            "soh": "str_so_h_sf",
+            "cur": "current_sf",
+            "max_cell_vol": "cell_vol_sf",
+            "min_cell_vol": "cell_vol_sf",
+            "max_mod_tmp": "mod_tmp_sf",
+            "min_mod_tmp": "mod_tmp_sf",
+        }
+
         mod_ct: int  # not set
         soc: int  # not set
         soh: int  # not set
@@ -278,6 +509,19 @@ class LithiumIonBattery(_Model, struct=struct.Struct(">5HhHhH3h4h")):
             object.__setattr__(self, "con_fail", self.ConFail(self.con_fail))
             object.__setattr__(self, "set_ena", self.SetEna(self.set_ena))
 
+    MODULE = String
+    MODULES = "strings"
+
+    SCALE_FACTORS: ClassVar[dict[str, str]] = {
+        "max_cell_vol": "cell_vol_sf",
+        "min_cell_vol": "cell_vol_sf",
+        "max_mod_tmp": "mod_tmp_sf",
+        "min_mod_tmp": "mod_tmp_sf",
+        "tot_dc_cur": "current_sf",
+        "max_str_cur": "current_sf",
+        "min_str_cur": "current_sf",
+    }
+
     con_str_ct: int
     max_cell_vol: int  # not set
     max_cell_vol_loc: int  # not set
@@ -297,27 +541,6 @@ class LithiumIonBattery(_Model, struct=struct.Struct(">5HhHhH3h4h")):
 
     strings: list[String] = dataclasses.field(default_factory=list)
 
-    @classmethod
-    @override
-    async def read(cls, client: AsyncModbusTcpClient, address: int) -> Self:
-        resp = await client.read_holding_registers(
-            address,
-            count=1 + cls.STRUCT.size // 2,
-        )
-
-        length = resp.registers[0]
-        this = cls.unpack_registers(resp.registers[1:])
-
-        string_count = (2 * length - cls.STRUCT.size) // cls.String.STRUCT.size
-        strings = await cls.String.read_many(
-            client,
-            address + (this.STRUCT.size // 2),
-            string_count,
-        )
-        object.__setattr__(this, "strings", strings)
-
-        return this
-
 
 # 203
 
@@ -355,6 +578,35 @@ class AbcnMeter(_Model, struct=struct.Struct(">4hh8hhhh4hh4hh4hh4hh8Lh8Lh16LhL")
         OEM14 = 1 << 29
         OEM15 = 1 << 30
 
+    SCALE_FACTORS: ClassVar[dict[str, str]] = {
+        **dict.fromkeys(("a", "aph_a", "aph_b", "aph_c"), "a_sf"),
+        **dict.fromkeys(
+            (
+                *("ph_v", "ph_vph_a", "ph_vph_b", "ph_vph_c"),
+                *("ppv", "ph_vph_ab", "ph_vph_bc", "ph_vph_ca"),
+            ),
+            "v_sf",
+        ),
+        "hz": "hz_sf",
+        **dict.fromkeys(("w", "wph_a", "wph_b", "wph_c"), "w_sf"),
+        **dict.fromkeys(("va", "v_aph_a", "v_aph_b", "v_aph_c"), "va_sf"),
+        **dict.fromkeys(("var", "va_rph_a", "va_rph_b", "va_rph_c"), "var_sf"),
+        **dict.fromkeys(("pf", "p_fph_a", "p_fph_b", "p_fph_c"), "pf_sf"),
+        **{
+            f"tot_{kind}{phase}": f"tot_{unit}_sf"
+            for unit, kinds in (
+                ("wh", ("wh_exp", "wh_imp")),
+                ("v_ah", ("v_ah_exp", "v_ah_imp")),
+                (
+                    "v_arh",
+                    ("v_arh_imp_q1", "v_arh_imp_q2", "v_arh_exp_q3", "v_arh_exp_q4"),
+                ),
+            )
+            for kind in kinds
+            for phase in ("", "_ph_a", "_ph_b", "_ph_c")
+        },
+    }
+
     a: int  # not set
     aph_a: int  # not set
     aph_b: int  # not set
@@ -435,7 +687,7 @@ class AbcnMeter(_Model, struct=struct.Struct(">4hh8hhhh4hh4hh4hh4hh8Lh8Lh16LhL")
 # 103
 @dataclasses.dataclass(frozen=True)
 class Inverter(_Model, struct=struct.Struct(">4Hh6HhhhhhhhhhhhLhHhHhhh4hh2H6L")):
-    class St(enum.IntEnum):
+    class St(_Enum):
         OFF = 1
         SLEEPING = 2
         STARTING = 3
@@ -463,6 +715,27 @@ class Inverter(_Model, struct=struct.Struct(">4Hh6HhhhhhhhhhhhLhHhHhhh4hh2H6L"))
         MEMORY_LOSS = 1 << 14
         HW_TEST_FAILURE = 1 << 15
 
+    SCALE_FACTORS: ClassVar[dict[str, str]] = {
+        **dict.fromkeys(("a", "aph_a", "aph_b", "aph_c"), "a_sf"),
+        **dict.fromkeys(
+            (
+                *("pp_vph_ab", "pp_vph_bc", "pp_vph_ca"),
+                *("ph_vph_a", "ph_vph_b", "ph_vph_c"),
+            ),
+            "v_sf",
+        ),
+        "w": "w_sf",
+        "hz": "hz_sf",
+        "va": "va_sf",
+        "v_ar": "v_ar_sf",
+        "pf": "pf_sf",
+        "wh": "wh_sf",
+        "dca": "dca_sf",
+        "dcv": "dcv_sf",
+        "dcw": "dcw_sf",
+        **dict.fromkeys(("tmp_cab", "tmp_snk", "tmp_trns", "tmp_ot"), "tmp_sf"),
+    }
+
     a: int
     aph_a: int
     aph_b: int
@@ -512,36 +785,429 @@ class Inverter(_Model, struct=struct.Struct(">4Hh6HhhhhhhhhhhhLhHhHhhh4hh2H6L"))
         object.__setattr__(self, "evt1", self.Evt1(self.evt1))
 
 
+# 160
+@dataclasses.dataclass(frozen=True)
+class Mppt(RepeatingModel, struct=struct.Struct(">4hLHH")):
+    @dataclasses.dataclass(frozen=True)
+    class Module(_Model, struct=struct.Struct(">H16s3HLLhHL")):
+        class DcSt(_Enum):
+            OFF = 1
+            SLEEPING = 2
+            STARTING = 3
+            MPPT = 4
+            THROTTLED = 5
+            SHUTTING_DOWN = 6
+            FAULT = 7
+            STANDBY = 8
+            TEST = 9
+            UNSUPPORTED = 0xFFFF  # not implemented
+
+        # The scale factors are fields of the MPPT model.
+        SCALE_FACTORS: ClassVar[dict[str, str]] = {
+            "dca": "dca_sf",
+            "dcv": "dcv_sf",
+            "dcw": "dcw_sf",
+            "dcwh": "dcwh_sf",
+        }
+
+        id: int
+        id_str: str
+        dca: int
+        dcv: int
+        dcw: int
+        dcwh: int
+        tms: int
+        tmp: int
+        dc_st: DcSt
+        dc_evt: int
+
+        @classmethod
+        @override
+        def unpack_from(cls, buffer: Buffer, offset: int = 0) -> Self:
+            values = cls.STRUCT.unpack_from(buffer, offset)
+            return cls(*map(_decode_str, values))
+
+        def __post_init__(self) -> None:
+            object.__setattr__(self, "dc_st", self.DcSt(self.dc_st))
+
+    MODULE = Module
+    MODULES = "modules"
+
+    dca_sf: int
+    dcv_sf: int
+    dcw_sf: int
+    dcwh_sf: int
+    evt: int
+    n: int
+    tms_per: int
+
+    modules: list[Module] = dataclasses.field(default_factory=list)
+
+
+def _fits(model: type[_Model], length: int) -> bool:
+    # Models may define points after the ones that are decoded.
+    if 2 * length < model.STRUCT.size:
+        return False
+    if issubclass(model, RepeatingModel):
+        return (2 * length - model.STRUCT.size) % model.MODULE.STRUCT.size == 0
+    return True
+
+
+def _image_offset(address: int) -> int:
+    return 2 * (address - BASE_ADDRESS)
+
+
+def _check_range(address: int, count: int) -> None:
+    # The register image starts at BASE_ADDRESS, see `cached_registers`.
+    if address < BASE_ADDRESS or address + count > ADDRESS_SPACE:
+        msg = f"{count} registers at {address} are outside of the register map"
+        raise ValueError(msg)
+
+
 class E3dc:
+    # Expected address of the length register of each block with a fixed address, the
+    # data follows right after it. `scan_register_map` checks them.
+    BLOCKS: dict[Block, tuple[type[_Model], int]] = {  # noqa: RUF012
+        "common": (Common, 40003),
+        "storage": (EnergyStorageBase, 40071),
+        "li_battery": (LithiumIonBattery, 40117),
+        "inverter": (Inverter, 40151),
+        "root_meter": (AbcnMeter, 40203),
+        "extra_meter": (AbcnMeter, 40310),
+    }
+    # Model and SunSpec model ID of every block, including the ones without a fixed
+    # address. Blocks with the same model ID are matched to the chain in order.
+    MODELS: dict[Block, tuple[type[_Model], int]] = {  # noqa: RUF012
+        "common": (Common, 1),
+        "storage": (EnergyStorageBase, 801),
+        "li_battery": (LithiumIonBattery, 803),
+        "inverter": (Inverter, 103),
+        "mppt": (Mppt, 160),
+        "root_meter": (AbcnMeter, 203),
+        "extra_meter": (AbcnMeter, 203),
+    }
+    REQUIRED_BLOCKS: frozenset[Block] = frozenset(
+        {"common", "storage", "inverter", "root_meter"}
+    )
+
     def __init__(self, client: AsyncModbusTcpClient) -> None:
         self._client = client
+        self._blocks = dict(self.BLOCKS)
+        # Big-endian copy of every register read so far, starting at BASE_ADDRESS.
+        self._image = bytearray()
+        # Monotonic time each register in the image was last read at, the midpoint
+        # between sending the request and receiving the response.
+        self._read_at = array.array("d")
+        self._pending: dict[RegisterRange, asyncio.Task[list[int]]] = {}
 
     @classmethod
     async def connect(cls, host: str) -> Self:
-        client = AsyncModbusTcpClient(host, name="e3dc")
+        host, port = split_host(host)
+        client = AsyncModbusTcpClient(host, port=port, name="e3dc")
         await client.connect()
         return cls(client)
 
+    @property
+    def connected(self) -> bool:
+        return self._client.connected
+
+    def close(self) -> None:
+        self._client.close()
+
+    def snapshot(self) -> Self:
+        """Copy of the registers read so far, to decode them in a worker thread.
+
+        Reads through this client don't affect the copy. The copy is only meant for
+        decoding, it shares the connection.
+        """
+        snapshot = copy.copy(self)
+        snapshot._blocks = dict(self._blocks)  # noqa: SLF001
+        snapshot._image = self._image.copy()  # noqa: SLF001
+        snapshot._read_at = array.array("d", self._read_at)  # noqa: SLF001
+        return snapshot
+
     async def is_sunspec(self) -> bool:
-        resp = await self._client.read_holding_registers(40000, count=2)
+        resp = await self._client.read_holding_registers(BASE_ADDRESS, count=2)
         raw = resp.registers[0] << 16 | resp.registers[1]
         value = raw.to_bytes(4, "big")
         return value == b"SunS"
 
+    async def _read_header(self, address: int, since: float) -> list[int]:
+        header = self.cached_registers(address, 2, time.monotonic() - since)
+        if header is not None:
+            return header
+        # Read ahead, the following headers are usually part of the same request.
+        try:
+            registers = await self.read_registers(
+                address, min(MAX_READ_COUNT, ADDRESS_SPACE - address)
+            )
+        except ModbusException:
+            # The read ahead may run past the end of the register map.
+            registers = await self.read_registers(address, 2)
+        return registers[:2]
+
+    async def read_model_chain(self) -> list[tuple[int, int, int]]:
+        """Walk the models of the register map in a few requests.
+
+        Returns the model ID, the address of the length register and the length of
+        every model, in order.
+        """
+        since = time.monotonic()
+        models: list[tuple[int, int, int]] = []
+        address = BASE_ADDRESS + 2
+        while address + 2 <= ADDRESS_SPACE:
+            model_id, length = await self._read_header(address, since)
+            if model_id in (0, END_MODEL_ID):
+                break
+            models.append((model_id, address + 1, length))
+            address += 2 + length
+        return models
+
+    async def scan_register_map(self) -> list[str]:
+        """Locate every block in the model chain and check its length.
+
+        Blocks found at another address than expected are remapped. Optional blocks
+        that are missing or too short are dropped and read as not present. Returns a
+        description of every deviation from the expected layout.
+
+        Raises:
+            RegisterMapError: A required block is missing or too short.
+
+        """
+        since = time.monotonic()
+        chain = await self.read_model_chain()
+        blocks: dict[Block, tuple[type[_Model], int]] = {}
+        findings: list[str] = []
+        for block, (model, model_id) in self.MODELS.items():
+            address, length = next(
+                (
+                    (address, length)
+                    for chain_id, address, length in chain
+                    if chain_id == model_id
+                    and address not in (a for _, a in blocks.values())
+                ),
+                (None, 0),
+            )
+            if address is None and block in self.BLOCKS:
+                # The chain may be broken by an empty header, e.g. of a missing
+                # battery, with the following blocks still at their usual address.
+                expected = self.BLOCKS[block][1]
+                header_id, header_length = await self._read_header(expected - 1, since)
+                if header_id == model_id:
+                    address, length = expected, header_length
+            if address is None:
+                finding = f"{block}: model {model_id} not found"
+            elif not _fits(model, length):
+                finding = f"{block}: model {model_id} at {address} has length {length}"
+            else:
+                blocks[block] = (model, address)
+                if (expected := self.BLOCKS.get(block)) and expected[1] != address:
+                    findings.append(f"{block}: moved from {expected[1]} to {address}")
+                continue
+
+            if block in self.REQUIRED_BLOCKS:
+                raise RegisterMapError(finding)
+            if block in self.BLOCKS:
+                findings.append(finding)
+
+        self._blocks = blocks
+        return findings
+
+    async def read_registers(self, address: int, count: int) -> list[int]:
+        _check_range(address, count)
+        # Concurrent reads of the same range share a single request.
+        key = (address, count)
+        if (task := self._pending.get(key)) is None:
+            task = asyncio.create_task(self._read_registers(address, count))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _read_registers(self, address: int, count: int) -> list[int]:
+        sent_at = time.monotonic()
+        resp = await self._client.read_holding_registers(address, count=count)
+        if resp.isError():
+            msg = f"reading {count} registers at {address} failed: {resp}"
+            raise ModbusException(msg)
+        self._store(address, resp.registers, (sent_at + time.monotonic()) / 2)
+        return resp.registers
+
+    async def write_registers(self, address: int, values: Sequence[int]) -> None:
+        resp = await self._client.write_registers(address, values)
+        if resp.isError():
+            msg = f"writing {len(values)} registers at {address} failed: {resp}"
+            raise ModbusException(msg)
+
+    async def write_fields(self, block: Block, values: dict[str, int]) -> None:
+        """Write single register fields, one request per run of adjacent registers."""
+        registers: dict[int, int] = {}
+        for field, value in values.items():
+            ((address, count),) = self.field_ranges(block, (field,))
+            if count != 1:
+                msg = f"{field} spans {count} registers"
+                raise ValueError(msg)
+            registers[address] = value & 0xFFFF
+
+        runs: list[tuple[int, list[int]]] = []
+        for address, value in sorted(registers.items()):
+            if runs and runs[-1][0] + len(runs[-1][1]) == address:
+                runs[-1][1].append(value)
+            else:
+                runs.append((address, [value]))
+        for address, run in runs:
+            await self.write_registers(address, run)
+
+    def cached_registers(
+        self, address: int, count: int, max_age: float
+    ) -> list[int] | None:
+        """Registers from the image if all of them were read in the last `max_age`."""
+        start = address - BASE_ADDRESS
+        if start < 0 or start + count > len(self._read_at):
+            return None
+        if min(self._read_at[start : start + count]) < time.monotonic() - max_age:
+            return None
+        return list(struct.unpack_from(f">{count}H", self._image, 2 * start))
+
+    async def read_registers_cached(
+        self, address: int, count: int, max_age: float
+    ) -> list[int]:
+        registers = self.cached_registers(address, count, max_age)
+        if registers is None:
+            registers = await self.read_registers(address, count)
+        return registers
+
+    async def read_ranges(self, ranges: Iterable[RegisterRange]) -> None:
+        for address, count in coalesce_ranges(ranges):
+            await self.read_registers(address, count)
+
+    def _store(self, address: int, registers: list[int], read_at: float) -> None:
+        _check_range(address, len(registers))
+        start = _image_offset(address)
+        end = start + 2 * len(registers)
+        if end > len(self._image):
+            self._image.extend(bytes(end - len(self._image)))
+        struct.pack_into(f">{len(registers)}H", self._image, start, *registers)
+
+        start //= 2
+        if (missing := start + len(registers) - len(self._read_at)) > 0:
+            self._read_at.extend(0.0 for _ in range(missing))
+        self._read_at[start : start + len(registers)] = array.array(
+            "d", [read_at] * len(registers)
+        )
+
+    def block_range(self, block: Block) -> RegisterRange:
+        """Range of the block data, not including the length register."""
+        model, address = self._blocks[block]
+        count = model.STRUCT.size // 2
+        if issubclass(model, RepeatingModel):
+            (length,) = struct.unpack_from(">H", self._image, _image_offset(address))
+            count += model.module_count(length) * (model.MODULE.STRUCT.size // 2)
+        return (address + 1, count)
+
+    def field_ranges(self, block: Block, fields: Iterable[str]) -> list[RegisterRange]:
+        model, address = self._blocks[block]
+        return [
+            (address + 1 + offset, count)
+            for offset, count in map(model.field_span, fields)
+        ]
+
+    def read_time(self, block: Block, field: str) -> float:
+        """Monotonic time the field was last read at."""
+        (address, _), *_ = self.field_ranges(block, (field,))
+        return self._read_at[address - BASE_ADDRESS]
+
+    def block_read_time(self, block: Block) -> float:
+        """Monotonic time of the latest read of any register of the block."""
+        address, count = self.block_range(block)
+        start = address - BASE_ADDRESS
+        return max(self._read_at[start : start + count], default=0.0)
+
+    def _is_present(self, block: Block) -> bool:
+        model, address = self._blocks[block]
+        start = _image_offset(address + 1)
+        registers = struct.unpack_from(
+            f">{model.STRUCT.size // 2}H", self._image, start
+        )
+        return not is_not_implemented(registers)
+
+    async def _read_block(self, block: Block) -> None:
+        model, header = self._blocks[block]
+        if not issubclass(model, RepeatingModel):
+            await self.read_registers(*self.block_range(block))
+            return
+
+        # The length register tells us how many modules follow the fixed part, so read
+        # it together with the fixed part first and then the modules.
+        fixed_count = model.STRUCT.size // 2
+        await self.read_registers(header, 1 + fixed_count)
+        address, count = self.block_range(block)
+        if count > fixed_count:
+            await self.read_registers(address + fixed_count, count - fixed_count)
+
+    def _decode[M: _Model](self, model: type[M], block: Block) -> M:
+        _, address = self._blocks[block]
+        return model.unpack_from(self._image, _image_offset(address + 1))
+
+    def decode_common(self) -> Common:
+        return self._decode(Common, "common")
+
+    def decode_storage(self) -> EnergyStorageBase:
+        return self._decode(EnergyStorageBase, "storage")
+
+    def decode_inverter(self) -> Inverter:
+        return self._decode(Inverter, "inverter")
+
+    def decode_lithium_ion_battery(self) -> LithiumIonBattery:
+        _, address = self._blocks["li_battery"]
+        return LithiumIonBattery.unpack_block(self._image, _image_offset(address))
+
+    def decode_mppt(self) -> Mppt:
+        _, address = self._blocks["mppt"]
+        return Mppt.unpack_block(self._image, _image_offset(address))
+
+    def decode_root_meter(self) -> AbcnMeter:
+        return self._decode(AbcnMeter, "root_meter")
+
+    def decode_extra_meter(self) -> AbcnMeter:
+        return self._decode(AbcnMeter, "extra_meter")
+
     async def read_common(self) -> Common:
-        return await Common.read(self._client, 40003)
+        await self._read_block("common")
+        return self.decode_common()
 
     async def read_storage(self) -> EnergyStorageBase:
-        return await EnergyStorageBase.read(self._client, 40071)
+        await self._read_block("storage")
+        return self.decode_storage()
 
     async def read_inverter(self) -> Inverter:
-        return await Inverter.read(self._client, 40151)
+        await self._read_block("inverter")
+        return self.decode_inverter()
+
+    async def read_lithium_ion_battery(self) -> LithiumIonBattery | None:
+        if "li_battery" not in self._blocks:
+            return None
+        await self._read_block("li_battery")
+        if not self._is_present("li_battery"):
+            return None
+        return self.decode_lithium_ion_battery()
 
-    async def read_lithium_ion_battery(self) -> LithiumIonBattery:
-        return await LithiumIonBattery.read(self._client, 40117)
+    async def read_mppt(self) -> Mppt | None:
+        if "mppt" not in self._blocks:
+            return None
+        await self._read_block("mppt")
+        if not self._is_present("mppt"):
+            return None
+        mppt = self.decode_mppt()
+        return mppt if mppt.modules else None
 
     async def read_root_meter(self) -> AbcnMeter:
-        return await AbcnMeter.read(self._client, 40203)
+        await self._read_block("root_meter")
+        return self.decode_root_meter()
 
-    async def read_extra_meter(self) -> AbcnMeter:
-        return await AbcnMeter.read(self._client, 40310)
+    async def read_extra_meter(self) -> AbcnMeter | None:
+        if "extra_meter" not in self._blocks:
+            return None
+        await self._read_block("extra_meter")
+        if not self._is_present("extra_meter"):
+            return None
+        return self.decode_extra_meter()
@@ -3,8 +3,14 @@ from typing import Any
 from urllib.parse import urlparse
 
 import voluptuous as vol
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    OptionsFlow,
+)
 from homeassistant.const import CONF_HOST
+from homeassistant.core import callback
 from homeassistant.helpers import selector
 from homeassistant.helpers.service_info.ssdp import SsdpServiceInfo
 
@@ -12,14 +18,129 @@ from .api import sunspec
 from .const import (
     ABORT_ALREADY_CONFIGURED,
     ABORT_DISCOVERY_FAILED,
+    CONF_ALIGN_POLLING,
+    CONF_EXPORT,
+    CONF_FUSE_RATING,
+    CONF_HISTORY_SIZE,
+    CONF_IMPORT_STATISTICS,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_METRICS,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_OFFLOAD_DECODING,
+    CONF_PROXY_HOST,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    CONF_SMOOTHED_FIELDS,
+    CONF_SMOOTHING,
+    CONF_SMOOTHING_WINDOW,
     CONF_SSDP_UDN,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_MAX_AGE,
+    DEFAULT_SMOOTHED_FIELDS,
+    DEFAULT_SMOOTHING_WINDOW,
     DOMAIN,
     ERROR_CANNOT_CONNECT,
     ERROR_NOT_IN_SUNSPEC_MODE,
+    MAX_HISTORY_SIZE,
+    SMOOTHING_NONE,
 )
+from .pool import async_get_pool
+from .smoothing import METHODS, SMOOTHABLE_FIELDS
 
 _LOGGER = logging.getLogger(__name__)
 
+_INTERVAL_SELECTOR = selector.NumberSelector(
+    selector.NumberSelectorConfig(
+        min=1, max=3600, unit_of_measurement="s", mode=selector.NumberSelectorMode.BOX
+    )
+)
+
+_OPTIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(
+            CONF_MIN_UPDATE_INTERVAL, default=DEFAULT_MIN_UPDATE_INTERVAL
+        ): _INTERVAL_SELECTOR,
+        vol.Required(
+            CONF_MAX_UPDATE_INTERVAL, default=DEFAULT_MAX_UPDATE_INTERVAL
+        ): _INTERVAL_SELECTOR,
+        vol.Required(CONF_ALIGN_POLLING, default=False): selector.BooleanSelector(),
+        vol.Optional(CONF_FUSE_RATING): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=1,
+                max=1000,
+                step=0.1,
+                unit_of_measurement="A",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        ),
+        vol.Required(CONF_SMOOTHING, default=SMOOTHING_NONE): selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=[SMOOTHING_NONE, *METHODS],
+                mode=selector.SelectSelectorMode.DROPDOWN,
+                translation_key=CONF_SMOOTHING,
+            )
+        ),
+        vol.Required(
+            CONF_SMOOTHING_WINDOW, default=DEFAULT_SMOOTHING_WINDOW
+        ): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=2, max=360, mode=selector.NumberSelectorMode.BOX
+            )
+        ),
+        vol.Required(
+            CONF_SMOOTHED_FIELDS, default=DEFAULT_SMOOTHED_FIELDS
+        ): selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=list(SMOOTHABLE_FIELDS),
+                multiple=True,
+                translation_key=CONF_SMOOTHED_FIELDS,
+            )
+        ),
+        vol.Required(CONF_IMPORT_STATISTICS, default=False): selector.BooleanSelector(),
+        vol.Optional(CONF_PROXY_PORT): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=1, max=65535, mode=selector.NumberSelectorMode.BOX
+            )
+        ),
+        vol.Required(
+            CONF_PROXY_HOST, default=DEFAULT_PROXY_HOST
+        ): selector.TextSelector(),
+        vol.Required(
+            CONF_PROXY_MAX_AGE, default=DEFAULT_PROXY_MAX_AGE
+        ): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=1,
+                max=3600,
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        ),
+        vol.Required(
+            CONF_HISTORY_SIZE, default=DEFAULT_HISTORY_SIZE
+        ): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0, max=MAX_HISTORY_SIZE, mode=selector.NumberSelectorMode.BOX
+            )
+        ),
+        vol.Required(CONF_METRICS, default=False): selector.BooleanSelector(),
+        vol.Required(CONF_EXPORT, default=False): selector.BooleanSelector(),
+        vol.Required(CONF_OFFLOAD_DECODING, default=False): selector.BooleanSelector(),
+    }
+)
+
+
+def _with_hostname(host: str, hostname: str) -> str:
+    """Replace the host name or address of a host, keeping its port."""
+    _, port = sunspec.split_host(host)
+    if port == sunspec.MODBUS_PORT:
+        return hostname
+    if ":" in hostname:
+        hostname = f"[{hostname}]"
+    return f"{hostname}:{port}"
+
 
 class E3dcConfigFlow(ConfigFlow, domain=DOMAIN):
     VERSION = 1
@@ -29,20 +150,35 @@ class E3dcConfigFlow(ConfigFlow, domain=DOMAIN):
     _host: str | None = None
     _common: sunspec.Common | None = None
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(_config_entry: ConfigEntry) -> OptionsFlow:
+        return E3dcOptionsFlow()
+
     async def _test_connection(self) -> str | None:
         assert self._host is not None  # noqa: S101
 
+        e3dc: sunspec.E3dc | None = None
         try:
             e3dc = await sunspec.E3dc.connect(self._host)
             if not await e3dc.is_sunspec():
                 _LOGGER.error("Device at %r is not in sunspec mode", self._host)
+                e3dc.close()
                 return ERROR_NOT_IN_SUNSPEC_MODE
 
             self._common = await e3dc.read_common()
         except Exception:
             _LOGGER.exception("Test connection to %r failed", self._host)
+            if e3dc is not None:
+                e3dc.close()
             return ERROR_CANNOT_CONNECT
 
+        assert e3dc is not None  # noqa: S101
+        assert self._common is not None  # noqa: S101
+        # For the coordinator of the entry this flow creates.
+        async_get_pool(self.hass).async_release(self._host, e3dc, self._common)
+        return None
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -73,19 +209,44 @@ class E3dcConfigFlow(ConfigFlow, domain=DOMAIN):
         self, discovery_info: SsdpServiceInfo
     ) -> ConfigFlowResult:
         self._ssdp_info = discovery_info
-        await self.async_set_unique_id(self._ssdp_info.ssdp_udn)
-
+        udn = discovery_info.ssdp_udn
         assert discovery_info.ssdp_location  # noqa: S101
-        self._host = urlparse(discovery_info.ssdp_location).hostname
-        self._abort_if_unique_id_configured(
-            {CONF_HOST: self._host},
-            error=ABORT_ALREADY_CONFIGURED,
-        )
+        host = urlparse(discovery_info.ssdp_location).hostname
+        assert host is not None  # noqa: S101
+
+        # Devices announce themselves often, known ones aren't probed again.
+        for entry in self._async_current_entries(include_ignore=False):
+            if entry.unique_id == udn or (
+                # Added manually, at the address it announces.
+                entry.unique_id is None
+                and sunspec.split_host(entry.data[CONF_HOST])[0] == host
+            ):
+                self._async_update_discovered_entry(entry, udn, host)
+                return self.async_abort(reason=ABORT_ALREADY_CONFIGURED)
+
+        await self.async_set_unique_id(udn)
+        self._abort_if_unique_id_configured(error=ABORT_ALREADY_CONFIGURED)
+        self._host = host
         if _err := await self._test_connection():
             return self.async_abort(reason=ABORT_DISCOVERY_FAILED)
 
         return await self.async_step_discovery_confirm()
 
+    @callback
+    def _async_update_discovered_entry(
+        self, entry: ConfigEntry, udn: str, hostname: str
+    ) -> None:
+        # Doesn't reload the entry, the coordinator reconnects if the host changed.
+        self.hass.config_entries.async_update_entry(
+            entry,
+            unique_id=udn,
+            data={
+                **entry.data,
+                CONF_HOST: _with_hostname(entry.data[CONF_HOST], hostname),
+                CONF_SSDP_UDN: udn,
+            },
+        )
+
     async def async_step_discovery_confirm(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -109,3 +270,18 @@ class E3dcConfigFlow(ConfigFlow, domain=DOMAIN):
                 "host": self._host,
             },
         )
+
+
+class E3dcOptionsFlow(OptionsFlow):
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=self.add_suggested_values_to_schema(
+                _OPTIONS_SCHEMA, self.config_entry.options
+            ),
+        )
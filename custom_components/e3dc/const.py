@@ -1,6 +1,33 @@
 DOMAIN = "e3dc"
 
 CONF_SSDP_UDN = "ssdp_udn"
+CONF_IMPORT_STATISTICS = "import_statistics"
+CONF_PROXY_PORT = "proxy_port"
+CONF_PROXY_HOST = "proxy_host"
+CONF_PROXY_MAX_AGE = "proxy_max_age"
+CONF_HISTORY_SIZE = "history_size"
+CONF_METRICS = "metrics"
+CONF_EXPORT = "export"
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
+CONF_ALIGN_POLLING = "align_polling"
+CONF_FUSE_RATING = "fuse_rating"
+CONF_OFFLOAD_DECODING = "offload_decoding"
+CONF_SMOOTHING = "smoothing"
+CONF_SMOOTHING_WINDOW = "smoothing_window"
+CONF_SMOOTHED_FIELDS = "smoothed_fields"
+
+DEFAULT_PROXY_HOST = "127.0.0.1"
+DEFAULT_PROXY_MAX_AGE = 10
+DEFAULT_HISTORY_SIZE = 360
+# About 1.5 kB per sample with all models present, 15 MB at the maximum.
+MAX_HISTORY_SIZE = 10000
+DEFAULT_MIN_UPDATE_INTERVAL = 10
+DEFAULT_MAX_UPDATE_INTERVAL = 120
+DEFAULT_SMOOTHING_WINDOW = 6
+DEFAULT_SMOOTHED_FIELDS = ["root_meter.w", "inverter.dcw", "li_battery.tot_dc_cur"]
+
+SMOOTHING_NONE = "none"
 
 ABORT_ALREADY_CONFIGURED = "already_configured"
 ABORT_DISCOVERY_FAILED = "discovery_failed"
@@ -1,26 +1,192 @@
+import asyncio
+import cProfile
+import dataclasses
+import functools
 import logging
-from datetime import timedelta
-from typing import override
+import math
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Literal, override
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import (
+    ConfigEntryError,
+    HomeAssistantError,
+    ServiceValidationError,
+)
 from homeassistant.helpers.device_registry import CONNECTION_UPNP, DeviceInfo
 from homeassistant.helpers.entity import EntityDescription
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
+    UpdateFailed,
 )
+from homeassistant.util import dt as dt_util
+from pymodbus.exceptions import ModbusException
 
 from .api import sunspec
-from .const import CONF_SSDP_UDN, DOMAIN
+from .const import (
+    CONF_ALIGN_POLLING,
+    CONF_EXPORT,
+    CONF_FUSE_RATING,
+    CONF_HISTORY_SIZE,
+    CONF_IMPORT_STATISTICS,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_METRICS,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_OFFLOAD_DECODING,
+    CONF_SMOOTHED_FIELDS,
+    CONF_SMOOTHING,
+    CONF_SMOOTHING_WINDOW,
+    CONF_SSDP_UDN,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_SMOOTHED_FIELDS,
+    DEFAULT_SMOOTHING_WINDOW,
+    DOMAIN,
+    MAX_HISTORY_SIZE,
+    SMOOTHING_NONE,
+)
+from .energy import EnergyCounter
+from .export import SampleExporter
+from .external_statistics import STATISTICS_CONTEXTS, StatisticsImporter
+from .history import SampleHistory
+from .phases import PhaseData
+from .polling import ACTIVITY_CONTEXTS, AdaptiveInterval, PollTiming
+from .pool import async_get_pool
+from .smoothing import Smoother
 
 _LOGGER = logging.getLogger(__name__)
 
 type E3dcConfigEntry = ConfigEntry[E3dcCoordinator]
+type OptionalModel = Literal["extra_meter", "li_battery", "mppt"]
+# Listener context of an entity: the block and fields its value is computed from.
+type FieldsContext = tuple[sunspec.Block, tuple[str, ...]]
+
+# Inverter fields the battery power is derived from. E3/DC doesn't populate the
+# battery voltage or power, but the battery is the only other thing connected to the
+# DC side of the hybrid inverter, so DC input minus AC output is the power flowing
+# into the battery, conversion losses included.
+BATTERY_POWER_CONTEXT: FieldsContext = ("inverter", ("dcw", "dcw_sf", "w", "w_sf"))
+
+# Blocks of the models in the snapshots.
+_DATA_BLOCKS: tuple[sunspec.Block, ...] = (
+    "storage",
+    "root_meter",
+    "inverter",
+    "extra_meter",
+    "li_battery",
+    "mppt",
+)
+# Blocks every device has, read in full by the first refresh.
+_CORE_BLOCKS: tuple[sunspec.Block, ...] = ("storage", "root_meter", "inverter")
+
+# How often models that were found to be absent are probed again.
+_ABSENT_REPROBE_INTERVAL = timedelta(hours=1)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SampleTime:
+    """When a model was read, the midpoint between request and response."""
+
+    monotonic: float
+    # Unix timestamp.
+    wall: float
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class E3dcData:
+    """Immutable snapshot of the decoded models published by a refresh."""
+
+    # Incremented with every snapshot, lets consumers cache derived values.
+    generation: int
+    common: sunspec.Common
+    storage: sunspec.EnergyStorageBase
+    root_meter: sunspec.AbcnMeter
+    inverter: sunspec.Inverter
+    extra_meter: sunspec.AbcnMeter | None
+    li_battery: sunspec.LithiumIonBattery | None
+    mppt: sunspec.Mppt | None
+    phases: PhaseData
+    # Latest read of each model in the snapshot.
+    read_times: dict[sunspec.Block, SampleTime]
+    # Smoothed fields, keyed by `<block>.<field>`.
+    smoothed: dict[str, float] = dataclasses.field(default_factory=dict)
+
 
+def _decode_snapshot(  # noqa: PLR0913
+    client: sunspec.E3dc,
+    probed: dict[OptionalModel, Any],
+    *,
+    generation: int,
+    common: sunspec.Common,
+    read_times: dict[sunspec.Block, SampleTime],
+    fuse_rating: float | None,
+) -> E3dcData:
+    """Decode the models from the register image and compute the derived values.
 
-class E3dcCoordinator(DataUpdateCoordinator[None]):
+    Only reads the image of the client, so that it can run in a worker thread on a
+    snapshot of the client. Optional models that were probed by this refresh are
+    taken as they are, the others are decoded.
+    """
+    root_meter = client.decode_root_meter()
+    inverter = client.decode_inverter()
+    extra_meter = (
+        probed["extra_meter"]
+        if "extra_meter" in probed
+        else client.decode_extra_meter()
+    )
+    return E3dcData(
+        generation=generation,
+        common=common,
+        storage=client.decode_storage(),
+        root_meter=root_meter,
+        inverter=inverter,
+        extra_meter=extra_meter,
+        li_battery=(
+            probed["li_battery"]
+            if "li_battery" in probed
+            else client.decode_lithium_ion_battery()
+        ),
+        mppt=probed["mppt"] if "mppt" in probed else client.decode_mppt(),
+        phases=PhaseData.analyze(root_meter, inverter, extra_meter, fuse_rating),
+        read_times=read_times,
+    )
+
+
+def _read_failed(address: int, count: int) -> HomeAssistantError:
+    return HomeAssistantError(
+        translation_domain=DOMAIN,
+        translation_key="read_failed",
+        translation_placeholders={"address": str(address), "count": str(count)},
+    )
+
+
+def _fail_register_reads(
+    requests: dict[sunspec.RegisterRange, asyncio.Future[list[int]]],
+) -> None:
+    # Cancelling would cancel the service calls waiting for them instead.
+    for (address, count), future in requests.items():
+        if not future.done():
+            future.set_exception(_read_failed(address, count))
+
+
+@dataclasses.dataclass(slots=True)
+class _ProfileRun:
+    profile: cProfile.Profile
+    remaining: int
+    done: asyncio.Future[None]
+    active: bool = False
+
+
+class E3dcCoordinator(DataUpdateCoordinator[E3dcData]):
     config_entry: E3dcConfigEntry
 
     def __init__(
@@ -28,21 +194,113 @@ class E3dcCoordinator(DataUpdateCoordinator[None]):
         hass: HomeAssistant,
         config_entry: E3dcConfigEntry,
     ) -> None:
+        options = self.options = config_entry.options
+        self._interval = AdaptiveInterval(
+            timedelta(
+                seconds=options.get(
+                    CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL
+                )
+            ),
+            timedelta(
+                seconds=options.get(
+                    CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL
+                )
+            ),
+        )
         super().__init__(
             hass,
             logger=_LOGGER,
             config_entry=config_entry,
             name="e3dc coordinator",
-            update_interval=timedelta(seconds=10),
+            update_interval=self._interval.interval,
         )
 
         self._client: sunspec.E3dc | None = None
+        # Host the client is connected to.
+        self._host: str | None = None
         self._common: sunspec.Common | None = None
-        self._storage: sunspec.EnergyStorageBase | None = None
-        self._root_meter: sunspec.AbcnMeter | None = None
-        self._extra_meter: sunspec.AbcnMeter | None = None
-        self._inverter: sunspec.Inverter | None = None
-        self._li_battery: sunspec.LithiumIonBattery | None = None
+        # Set on connect and after a failed refresh, the device may have been
+        # restarted or updated since.
+        self._revalidate = True
+        # Read by the config flow the connection was adopted from.
+        self._adopted_common: sunspec.Common | None = None
+        self._map_findings: list[str] = []
+        self._generation = 0
+        # Absent optional models, mapped to the time they should be probed again.
+        self._absent: dict[OptionalModel, datetime] = {}
+
+        self._statistics: StatisticsImporter | None = None
+        if config_entry.options.get(CONF_IMPORT_STATISTICS, False):
+            # The recorder is only an after dependency.
+            if "recorder" in hass.config.components:
+                self._statistics = StatisticsImporter(
+                    hass, config_entry.entry_id, config_entry.title
+                )
+            else:
+                _LOGGER.warning(
+                    "Not importing statistics for %s, the recorder isn't loaded",
+                    config_entry.title,
+                )
+
+        self._exporter: SampleExporter | None = None
+        if options.get(CONF_EXPORT, False):
+            self._exporter = SampleExporter(
+                hass, Path(hass.config.path("e3dc_export", config_entry.entry_id))
+            )
+
+        # Every field of the snapshots is served to the metrics endpoint.
+        self._metrics = bool(options.get(CONF_METRICS, False))
+
+        self.history: SampleHistory | None = None
+        # Entries may still have a size from when the maximum was higher.
+        if history_size := min(
+            int(config_entry.options.get(CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE)),
+            MAX_HISTORY_SIZE,
+        ):
+            self.history = SampleHistory(history_size)
+
+        self._align = bool(options.get(CONF_ALIGN_POLLING, False))
+        self._fuse_rating: float | None = options.get(CONF_FUSE_RATING)
+        self._offload_decoding = bool(options.get(CONF_OFFLOAD_DECODING, False))
+        self._smoother: Smoother | None = None
+        if (method := options.get(CONF_SMOOTHING, SMOOTHING_NONE)) != SMOOTHING_NONE:
+            self._smoother = Smoother(
+                method,
+                int(options.get(CONF_SMOOTHING_WINDOW, DEFAULT_SMOOTHING_WINDOW)),
+                options.get(CONF_SMOOTHED_FIELDS, DEFAULT_SMOOTHED_FIELDS),
+            )
+        self._refresh_scheduled = False
+        self._unsub_aligned_refresh: CALLBACK_TYPE | None = None
+        self.timing = PollTiming()
+
+        self.update_count = 0
+        self.update_failures = 0
+        self.update_duration: float | None = None
+        # Time the entities took to handle the latest refresh, apart from polling.
+        self.publish_duration: float | None = None
+        self.publish_seconds_total = 0.0
+        # Maintained by the entities, see the sensor deadbands.
+        self.state_writes = 0
+        self.suppressed_state_writes = 0
+
+        self._profile_run: _ProfileRun | None = None
+
+        # Storage setpoints waiting for the write that is in flight.
+        self._pending_writes: dict[str, int] = {}
+        self._write_task: asyncio.Task[None] | None = None
+        # Written setpoints and the time they were written at, until they're read back.
+        self._unverified_writes: dict[str, tuple[int, float]] = {}
+
+        # Ad-hoc register reads waiting for the next refresh.
+        self._register_reads: dict[
+            sunspec.RegisterRange, asyncio.Future[list[int]]
+        ] = {}
+
+        # Positive while charging.
+        # Idle refreshes are far apart, but the power hardly changes meanwhile.
+        self.battery_energy = EnergyCounter(
+            max_gap=max(300.0, 2 * self._interval.maximum.total_seconds())
+        )
 
     @property
     def client(self) -> sunspec.E3dc:
@@ -50,48 +308,467 @@ class E3dcCoordinator(DataUpdateCoordinator[None]):
         return self._client
 
     @property
-    def common(self) -> sunspec.Common:
-        assert self._common is not None  # noqa: S101
-        return self._common
+    def connected(self) -> bool:
+        """Whether there is a client, there is none while reconnecting."""
+        return self._client is not None
 
     @property
-    def storage(self) -> sunspec.EnergyStorageBase:
-        assert self._storage is not None  # noqa: S101
-        return self._storage
+    def smoothed_fields(self) -> tuple[str, ...]:
+        """Fields with a smoothed companion, as `<block>.<field>`."""
+        return self._smoother.fields if self._smoother is not None else ()
 
     @property
-    def root_meter(self) -> sunspec.AbcnMeter:
-        assert self._root_meter is not None  # noqa: S101
-        return self._root_meter
+    def host_changed(self) -> bool:
+        """Whether the host of the entry changed since connecting, to reconnect."""
+        return self._host != self.config_entry.data[CONF_HOST]
 
-    @property
-    def extra_meter(self) -> sunspec.AbcnMeter:
-        assert self._extra_meter is not None  # noqa: S101
-        return self._extra_meter
+    @override
+    async def _async_setup(self) -> None:
+        if self._statistics is not None:
+            await self._statistics.async_load()
+        if self._exporter is not None:
+            self._exporter.async_start()
 
-    @property
-    def inverter(self) -> sunspec.Inverter:
-        assert self._inverter is not None  # noqa: S101
-        return self._inverter
+    @override
+    async def async_shutdown(self) -> None:
+        await super().async_shutdown()
+        self._cancel_aligned_refresh()
+        if self._exporter is not None:
+            await self._exporter.async_stop()
+        if self._statistics is not None:
+            await self._statistics.async_flush()
+        if (run := self._profile_run) is not None and not run.done.done():
+            run.done.set_exception(HomeAssistantError("Coordinator was shut down"))
+        _fail_register_reads(self._register_reads)
+        if self._client is not None:
+            self._client.close()
+
+    async def async_profile(self, cycles: int) -> cProfile.Profile:
+        """Profile the next refresh cycles, including the entity updates."""
+        if self._profile_run is not None:
+            msg = "A profile is already running"
+            raise HomeAssistantError(msg)
+
+        run = _ProfileRun(cProfile.Profile(), cycles, self.hass.loop.create_future())
+        self._profile_run = run
+        try:
+            await run.done
+        finally:
+            self._profile_run = None
+        return run.profile
+
+    @callback
+    @override
+    def async_update_listeners(self) -> None:
+        start = time.perf_counter()
+        super().async_update_listeners()
+        self.publish_duration = time.perf_counter() - start
+        self.publish_seconds_total += self.publish_duration
+
+    @override
+    async def _async_refresh(
+        self,
+        log_failures: bool = True,
+        raise_on_auth_failed: bool = False,
+        scheduled: bool = False,
+        raise_on_entry_error: bool = False,
+    ) -> None:
+        self._refresh_scheduled = scheduled
+        # Rescheduled once the refresh is done.
+        self._cancel_aligned_refresh()
+        run = self._profile_run
+        if run is None or run.active or run.done.done():
+            await super()._async_refresh(
+                log_failures, raise_on_auth_failed, scheduled, raise_on_entry_error
+            )
+            return
+
+        # The profiler sees everything running on the event loop meanwhile.
+        try:
+            run.profile.enable()
+        except ValueError as err:
+            # Another profiler is active, the refresh goes on without profiling.
+            run.done.set_exception(HomeAssistantError(f"Can't profile: {err}"))
+            await super()._async_refresh(
+                log_failures, raise_on_auth_failed, scheduled, raise_on_entry_error
+            )
+            return
+        run.active = True
+        try:
+            await super()._async_refresh(
+                log_failures, raise_on_auth_failed, scheduled, raise_on_entry_error
+            )
+        finally:
+            run.profile.disable()
+            run.active = False
+        run.remaining -= 1
+        if run.remaining <= 0:
+            run.done.set_result(None)
+
+    async def async_write_storage(self, values: dict[str, float]) -> None:
+        """Write storage setpoints, given in the units of their sensors.
+
+        Setpoints set while a write is in flight are merged into the next one, so
+        there is at most one write request at a time. The next refresh reads the
+        written registers back to verify them.
+        """
+        storage = self.data.storage
+        # All of them are validated first, so that a call that fails doesn't leave
+        # some of them to be written.
+        raw_values: dict[str, int] = {}
+        for field, value in values.items():
+            raw = storage.unscaled(field, value)
+            if field not in storage.CONTROLS or raw not in range(0x10000):
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="invalid_setpoint",
+                    translation_placeholders={"field": field, "value": str(value)},
+                )
+            raw_values[field] = raw
+        self._pending_writes.update(raw_values)
+
+        if (task := self._write_task) is None or task.done():
+            task = self._write_task = self.hass.async_create_task(
+                self._async_write_pending(), "e3dc storage write"
+            )
+        await asyncio.shield(task)
+
+    async def _async_write_pending(self) -> None:
+        try:
+            while self._pending_writes:
+                values, self._pending_writes = self._pending_writes, {}
+                await self.client.write_fields("storage", values)
+                written_at = time.monotonic()
+                for field, value in values.items():
+                    self._unverified_writes[field] = (value, written_at)
+        except ModbusException as err:
+            self._pending_writes.clear()
+            raise HomeAssistantError(
+                translation_domain=DOMAIN,
+                translation_key="write_failed",
+                translation_placeholders={"error": str(err)},
+            ) from err
+
+        self.config_entry.async_create_background_task(
+            self.hass, self.async_request_refresh(), "e3dc storage read back"
+        )
+
+    async def async_read_registers(
+        self, address: int, count: int, max_age: float
+    ) -> list[int]:
+        """Registers read in the last `max_age` seconds, or by the next refresh.
+
+        Requests that miss the cache are read after the planned ranges of the next
+        refresh, coalesced with each other, instead of sending a request right away.
+        """
+        registers = self.client.cached_registers(address, count, max_age)
+        if registers is not None:
+            return registers
+
+        key = (address, count)
+        if (future := self._register_reads.get(key)) is None:
+            future = self._register_reads[key] = self.hass.loop.create_future()
+        return await asyncio.shield(future)
+
+    async def _read_requested_registers(self, since: float) -> None:
+        requests, self._register_reads = self._register_reads, {}
+        try:
+            for address, count in sunspec.coalesce_ranges(requests):
+                if (
+                    self.client.cached_registers(
+                        address, count, time.monotonic() - since
+                    )
+                    is not None
+                ):
+                    # Already read as part of the plan.
+                    continue
+                try:
+                    await self.client.read_registers(address, count)
+                except ModbusException as err:
+                    _LOGGER.debug("Reading requested registers failed: %s", err)
+
+            for (address, count), future in requests.items():
+                registers = self.client.cached_registers(
+                    address, count, time.monotonic() - since
+                )
+                if registers is not None:
+                    future.set_result(registers)
+                else:
+                    future.set_exception(_read_failed(address, count))
+        finally:
+            _fail_register_reads(requests)
+
+    def _verify_writes(self, storage: sunspec.EnergyStorageBase) -> None:
+        for field, (value, written_at) in list(self._unverified_writes.items()):
+            if self.client.read_time("storage", field) <= written_at:
+                # Not read since the write.
+                continue
+            del self._unverified_writes[field]
+            if (actual := getattr(storage, field)) != value:
+                _LOGGER.warning(
+                    "Wrote %d to %s, but it reads back as %d", value, field, actual
+                )
+
+    @callback
+    @override
+    def _schedule_refresh(self) -> None:
+        if not self._align or (interval := self.update_interval) is None:
+            super()._schedule_refresh()
+            return
+        if self.config_entry.pref_disable_polling:
+            return
+
+        # Refresh on the next multiple of the interval in wall-clock time, at least
+        # half an interval from now, which lines up the samples of all entries.
+        self._cancel_aligned_refresh()
+        seconds = interval.total_seconds()
+        now = time.time()
+        boundary = math.ceil((now + seconds / 2) / seconds) * seconds
+        self._unsub_aligned_refresh = async_call_later(
+            self.hass, boundary - now, self._handle_aligned_refresh
+        )
+
+    @callback
+    def _handle_aligned_refresh(self, _now: datetime) -> None:
+        self._unsub_aligned_refresh = None
+        self.config_entry.async_create_background_task(
+            self.hass,
+            self._async_refresh(log_failures=True, scheduled=True),
+            f"{self.name} - {self.config_entry.title} - aligned refresh",
+        )
+
+    @callback
+    @override
+    def _unschedule_refresh(self) -> None:
+        super()._unschedule_refresh()
+        self._cancel_aligned_refresh()
+
+    @callback
+    def _cancel_aligned_refresh(self) -> None:
+        if self._unsub_aligned_refresh is not None:
+            self._unsub_aligned_refresh()
+            self._unsub_aligned_refresh = None
+
+    def is_present(self, model: OptionalModel) -> bool:
+        return model not in self._absent
+
+    async def _read_optional[T](
+        self,
+        model: OptionalModel,
+        read: Callable[[], Awaitable[T | None]],
+    ) -> T | None:
+        reprobe_at = self._absent.get(model)
+        if reprobe_at is not None and dt_util.utcnow() < reprobe_at:
+            return None
+
+        if (value := await read()) is None:
+            if reprobe_at is None:
+                _LOGGER.info("%s is not present, no longer polling it", model)
+            self._absent[model] = dt_util.utcnow() + _ABSENT_REPROBE_INTERVAL
+            return None
+
+        if reprobe_at is not None:
+            _LOGGER.info("%s is now present, reloading to add its entities", model)
+            del self._absent[model]
+            self.hass.config_entries.async_schedule_reload(self.config_entry.entry_id)
+        return value
+
+    async def _connect(self) -> sunspec.E3dc:
+        host = self._host = self.config_entry.data[CONF_HOST]
+        self._revalidate = True
+        if (pooled := async_get_pool(self.hass).async_adopt(host)) is not None:
+            _LOGGER.debug("Adopted the connection to %s from the config flow", host)
+            client, self._adopted_common = pooled
+            return client
+        return await sunspec.E3dc.connect(host)
+
+    async def _validate_register_map(self) -> None:
+        # Only runs after connecting and after failures, not on every refresh.
+        try:
+            findings = await self.client.scan_register_map()
+        except sunspec.RegisterMapError as err:
+            raise ConfigEntryError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_register_map",
+                translation_placeholders={"error": str(err)},
+            ) from err
+        common = self._adopted_common or await self.client.read_common()
+        self._adopted_common = None
+
+        previous = self._common
+        self._common = common
+        self._revalidate = False
+        if findings != self._map_findings:
+            for finding in findings:
+                _LOGGER.warning("Unexpected register map layout, %s", finding)
+        if previous is None:
+            self._map_findings = findings
+            return
+
+        if (previous.options, previous.version) != (common.options, common.version):
+            _LOGGER.warning(
+                "Firmware changed from %s %s to %s %s, reloading",
+                previous.options,
+                previous.version,
+                common.options,
+                common.version,
+            )
+        elif findings == self._map_findings:
+            return
+        # The models and their entities may have changed.
+        self._map_findings = findings
+        self.hass.config_entries.async_schedule_reload(self.config_entry.entry_id)
+        msg = "firmware or register map changed, reloading"
+        raise UpdateFailed(msg)
+
+    async def _probe_optional(
+        self, previous: E3dcData | None
+    ) -> dict[OptionalModel, Any]:
+        """Read the optional models that weren't seen yet in full.
+
+        Optional models are probed in full until they were seen once, after that
+        their fields are part of the read plan. A model that disappears at runtime
+        keeps its entities.
+        """
+        reads: dict[OptionalModel, Callable[[], Awaitable[Any]]] = {
+            "extra_meter": self.client.read_extra_meter,
+            "li_battery": self.client.read_lithium_ion_battery,
+            "mppt": self.client.read_mppt,
+        }
+        return {
+            model: await self._read_optional(model, read)
+            for model, read in reads.items()
+            if getattr(previous, model, None) is None
+        }
 
     @property
-    def li_battery(self) -> sunspec.LithiumIonBattery:
-        assert self._li_battery is not None  # noqa: S101
-        return self._li_battery
+    def _records_all_fields(self) -> bool:
+        """Whether every field is recorded, so that all of them have to be read."""
+        return self._metrics or self._exporter is not None
+
+    def _read_plan(self) -> list[sunspec.RegisterRange]:
+        """Register ranges needed by the entities, recorders, poll interval and writes.
+
+        Fields that are recorded are read on every refresh even if none of their
+        entities is enabled.
+        """
+        contexts = [*self.async_contexts(), *ACTIVITY_CONTEXTS]
+        if self._statistics is not None:
+            contexts.extend(STATISTICS_CONTEXTS)
+        fields: defaultdict[sunspec.Block, set[str]] = defaultdict(set)
+        for block, block_fields in contexts:
+            fields[block].update(block_fields)
+        fields["storage"].update(self._unverified_writes)
+
+        ranges = [
+            register_range
+            for block, block_fields in fields.items()
+            if block not in self._absent
+            for register_range in self.client.field_ranges(block, block_fields)
+        ]
+        if self._records_all_fields:
+            # Read in full like by the first refresh, stale fields would be recorded
+            # as new samples.
+            ranges.extend(
+                self.client.block_range(block)
+                for block in _DATA_BLOCKS
+                if block not in self._absent
+            )
+        return ranges
 
     @override
-    async def _async_update_data(self) -> None:
+    async def _async_update_data(self) -> E3dcData:
+        start = time.perf_counter()
+        try:
+            return await self._poll()
+        except Exception:
+            self.update_failures += 1
+            self._revalidate = True
+            raise
+        finally:
+            self.update_count += 1
+            self.update_duration = time.perf_counter() - start
+
+    async def _poll(self) -> E3dcData:
+        if self._client is not None and self.host_changed:
+            _LOGGER.info("Host changed from %s, reconnecting", self._host)
+            self._client.close()
+            self._client = None
         if self._client is None:
-            self._client = await sunspec.E3dc.connect(self.config_entry.data[CONF_HOST])
+            self._client = await self._connect()
+
+        if self._revalidate:
+            await self._validate_register_map()
+
+        if (previous := self.data) is None:
+            # Read everything in full once, entities only exist after the first refresh.
+            await self._client.read_ranges(
+                self._client.block_range(block) for block in _CORE_BLOCKS
+            )
+        else:
+            read_start = time.monotonic()
+            await self._client.read_ranges(self._read_plan())
+            await self._read_requested_registers(read_start)
+        probed = await self._probe_optional(previous)
 
-        if self._common is None:
-            self._common = await self._client.read_common()
+        self._generation += 1
+        # Wall-clock time at the zero point of the monotonic clock.
+        offset = time.time() - time.monotonic()
+        read_times = {
+            block: SampleTime(read_at, read_at + offset)
+            for block in _DATA_BLOCKS
+            if block not in self._absent
+            and (read_at := self._client.block_read_time(block))
+        }
+        decode = functools.partial(
+            _decode_snapshot,
+            probed=probed,
+            generation=self._generation,
+            common=self._common,
+            read_times=read_times,
+            fuse_rating=self._fuse_rating,
+        )
+        if self._offload_decoding:
+            # Decodes a copy, reads for the proxy and the services may change the
+            # image of the client meanwhile.
+            data = await self.hass.async_add_executor_job(
+                decode, self._client.snapshot()
+            )
+        else:
+            data = decode(self._client)
+        if previous is not None:
+            self._verify_writes(data.storage)
+        if self._smoother is not None:
+            data = dataclasses.replace(data, smoothed=self._smoother.add_sample(data))
+
+        # Sampled when both powers were last read, so that a stale register isn't
+        # integrated again.
+        self.battery_energy.add_sample(
+            min(
+                self._client.read_time("inverter", "dcw"),
+                self._client.read_time("inverter", "w"),
+            ),
+            data.inverter.scaled("dcw") - data.inverter.scaled("w"),
+        )
+
+        if self.update_interval is not None:
+            self.timing.add_sample(
+                read_times["inverter"].monotonic,
+                self.update_interval.total_seconds(),
+                scheduled=self._refresh_scheduled,
+            )
+        self.update_interval = self._interval.update(data)
+        self._record(data)
+        return data
 
-        self._storage = await self._client.read_storage()
-        self._root_meter = await self._client.read_root_meter()
-        self._extra_meter = await self._client.read_extra_meter()
-        self._inverter = await self._client.read_inverter()
-        self._li_battery = await self._client.read_lithium_ion_battery()
+    def _record(self, data: E3dcData) -> None:
+        now = dt_util.utc_from_timestamp(data.read_times["inverter"].wall)
+        if self._statistics is not None:
+            self._statistics.add_sample(data, now, self.client.read_time)
+        if self._exporter is not None:
+            self._exporter.add_sample(data, now)
+        if self.history is not None:
+            self.history.append(now.timestamp(), data, self.client.read_time)
 
 
 class E3dcEntity[DescT: EntityDescription](CoordinatorEntity[E3dcCoordinator]):
@@ -105,8 +782,9 @@ class E3dcEntity[DescT: EntityDescription](CoordinatorEntity[E3dcCoordinator]):
         entity_description: DescT,
         *,
         device_key: str | None = None,
+        context: FieldsContext | None = None,
     ) -> None:
-        super().__init__(coordinator)
+        super().__init__(coordinator, context)
         self.entity_description = entity_description
         self._attr_unique_id = (
             f"{coordinator.config_entry.entry_id}_{entity_description.key}"
@@ -132,8 +810,8 @@ class E3dcEntity[DescT: EntityDescription](CoordinatorEntity[E3dcCoordinator]):
 
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, domain_id)},
-            manufacturer=coordinator.common.manufacturer,
-            model=coordinator.common.options if device_key is None else None,
+            manufacturer=coordinator.data.common.manufacturer,
+            model=coordinator.data.common.options if device_key is None else None,
             connections=connections,
             translation_key=device_key or "hub",
             translation_placeholders={
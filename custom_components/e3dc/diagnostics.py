@@ -0,0 +1,34 @@
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_SSDP_UDN
+from .coordinator import E3dcConfigEntry
+
+# The unique ID of discovered entries is the UDN as well.
+_TO_REDACT = {CONF_HOST, CONF_SSDP_UDN, "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    _hass: HomeAssistant, entry: E3dcConfigEntry
+) -> dict[str, Any]:
+    coordinator = entry.runtime_data
+    return {
+        "entry": async_redact_data(entry.as_dict(), _TO_REDACT),
+        "poll_timing": {
+            "update_interval": (
+                interval.total_seconds()
+                if (interval := coordinator.update_interval) is not None
+                else None
+            ),
+            **coordinator.timing.as_dict(),
+        },
+        "state_writes": {
+            "written": coordinator.state_writes,
+            "suppressed": coordinator.suppressed_state_writes,
+            "last_publish_duration": coordinator.publish_duration,
+            "publish_seconds_total": coordinator.publish_seconds_total,
+        },
+    }
@@ -0,0 +1,40 @@
+class EnergyCounter:
+    """Integrates a signed power into separate positive and negative energy totals.
+
+    The trapezoidal rule is used between samples. If the power changes sign between
+    two samples, the interval is split at the interpolated zero crossing, so that
+    the two directions don't cancel out.
+    """
+
+    def __init__(self, max_gap: float) -> None:
+        # Samples further apart than this many seconds aren't integrated, as nothing
+        # is known about the power in between, e.g. while the device was unreachable.
+        self._max_gap = max_gap
+        # Energy in Wh since the counter was created.
+        self.positive = 0.0
+        self.negative = 0.0
+        self._last: tuple[float, float] | None = None
+
+    def _add(self, energy: float) -> None:
+        if energy > 0:
+            self.positive += energy
+        else:
+            self.negative -= energy
+
+    def add_sample(self, timestamp: float, power: float) -> None:
+        """Add a power sample in W, taken at the monotonic `timestamp`."""
+        last = self._last
+        if last is not None and timestamp <= last[0]:
+            # Nothing was read since the previous sample.
+            return
+        self._last = (timestamp, power)
+        if last is None or (duration := timestamp - last[0]) > self._max_gap:
+            return
+
+        last_power = last[1]
+        if last_power * power < 0:
+            crossing = duration * last_power / (last_power - power)
+            self._add(last_power * crossing / 2 / 3600)
+            self._add(power * (duration - crossing) / 2 / 3600)
+        else:
+            self._add((last_power + power) * duration / 2 / 3600)
@@ -0,0 +1,159 @@
+"""Export of every decoded field to daily CSV files.
+
+Samples are buffered in memory and appended to the files in batches from the
+executor. There is one file per UTC day, with a header row and one row per refresh,
+so that it can be loaded with `pandas.read_csv` or `polars.read_csv` as is.
+"""
+
+import asyncio
+import csv
+import enum
+import io
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .api import sunspec
+
+if TYPE_CHECKING:
+    from .coordinator import E3dcData
+
+_LOGGER = logging.getLogger(__name__)
+
+_FLUSH_INTERVAL = timedelta(minutes=5)
+
+_MODELS = ("storage", "inverter", "root_meter", "extra_meter", "li_battery", "mppt")
+
+
+def _value(value: Any) -> Any:  # noqa: ANN401
+    # Flags are kept as numbers, states are written by name.
+    if isinstance(value, enum.IntEnum):
+        return value.name.lower()
+    return value
+
+
+def _scaled(model: sunspec._Model, field: str) -> Any:  # noqa: ANN401
+    try:
+        return _value(model.scaled(field))
+    except IndexError:
+        # A module that disappeared since the columns were fixed.
+        return None
+
+
+def _header_line(columns: list[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().rstrip("\r\n")
+
+
+class SampleExporter:
+    def __init__(self, hass: HomeAssistant, directory: Path) -> None:
+        self._hass = hass
+        self._directory = directory
+        # Models and their fields, in column order. Fixed by the first sample.
+        self._layout: list[tuple[str, list[str]]] | None = None
+        self._columns: list[str] = []
+        self._rows: list[tuple[str, list[Any]]] = []
+        # File of every day that was written to already.
+        self._paths: dict[str, Path] = {}
+        self._lock = asyncio.Lock()
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    def _init_layout(self, data: "E3dcData") -> list[tuple[str, list[str]]]:
+        layout: list[tuple[str, list[str]]] = []
+        for model_name in _MODELS:
+            if (model := getattr(data, model_name)) is None:
+                continue
+            fields = model.value_fields()
+            if isinstance(model, sunspec.RepeatingModel):
+                fields = [*fields, *model.module_value_fields()]
+            layout.append((model_name, fields))
+
+        self._columns = [
+            "time",
+            *(
+                f"{model_name}.{field}"
+                for model_name, fields in layout
+                for field in fields
+            ),
+        ]
+        return layout
+
+    def add_sample(self, data: "E3dcData", now: datetime) -> None:
+        if (layout := self._layout) is None:
+            layout = self._layout = self._init_layout(data)
+
+        row: list[Any] = [now.isoformat()]
+        for model_name, fields in layout:
+            if (model := getattr(data, model_name)) is None:
+                row.extend(None for _ in fields)
+            else:
+                row.extend(_scaled(model, field) for field in fields)
+        self._rows.append((now.date().isoformat(), row))
+
+    @callback
+    def async_start(self) -> None:
+        self._unsubs = [
+            async_track_time_interval(
+                self._hass, self._async_flush, _FLUSH_INTERVAL, cancel_on_shutdown=True
+            ),
+            self._hass.bus.async_listen(
+                EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_flush
+            ),
+        ]
+
+    async def async_stop(self) -> None:
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs.clear()
+        await self._async_flush()
+
+    async def _async_flush(self, _now: datetime | Event | None = None) -> None:
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                await self._hass.async_add_executor_job(
+                    self._write, self._columns, rows
+                )
+            except OSError:
+                _LOGGER.exception("Failed to export %d samples", len(rows))
+
+    def _path(self, day: str, header: str) -> Path:
+        if (path := self._paths.get(day)) is not None:
+            return path
+
+        # Files of the same day written with other columns, e.g. before a battery
+        # string was added, are left alone.
+        path = self._directory / f"{day}.csv"
+        index = 0
+        while path.exists():
+            with path.open(encoding="utf-8", newline="") as file:
+                if file.readline().rstrip("\r\n") == header:
+                    break
+            index += 1
+            path = self._directory / f"{day}_{index}.csv"
+        self._paths[day] = path
+        return path
+
+    def _write(self, columns: list[str], rows: list[tuple[str, list[Any]]]) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        header = _header_line(columns)
+        by_day: dict[str, list[list[Any]]] = {}
+        for day, row in rows:
+            by_day.setdefault(day, []).append(row)
+
+        for day, day_rows in by_day.items():
+            path = self._path(day, header)
+            new = not path.exists()
+            with path.open("a", encoding="utf-8", newline="") as file:
+                writer = csv.writer(file)
+                if new:
+                    writer.writerow(columns)
+                writer.writerows(day_rows)
@@ -0,0 +1,335 @@
+"""Hourly long-term statistics imported directly from the polled samples.
+
+Instead of letting the recorder compile statistics from the state history, the
+power fields are aggregated into a time-weighted mean, min and max and the energy
+counters into a sum, all imported once per hour as external statistics.
+"""
+
+import dataclasses
+import logging
+import math
+from collections.abc import Callable
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMeanType,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.const import UnitOfElectricCurrent, UnitOfEnergy, UnitOfPower
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import sunspec
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from .coordinator import E3dcData, FieldsContext
+
+_LOGGER = logging.getLogger(__name__)
+
+_STORAGE_VERSION = 1
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class _Series[ModelT]:
+    key: str
+    name: str
+    unit: str
+    model: sunspec.Block
+    # Fields the value is computed from.
+    fields: tuple[str, ...]
+    value_fn: Callable[[ModelT], float]
+    # Counters are imported as a sum of their increases instead of mean/min/max.
+    counter: bool = False
+
+
+_METER_SERIES: list[_Series[sunspec.AbcnMeter]] = [
+    _Series(
+        key="w",
+        name="Root Meter Power",
+        unit=UnitOfPower.WATT,
+        model="root_meter",
+        fields=("w", "w_sf"),
+        value_fn=lambda meter: meter.w * (10**meter.w_sf),
+    ),
+    _Series(
+        key="tot_wh_exp",
+        name="Root Meter Total Energy Exported",
+        unit=UnitOfEnergy.WATT_HOUR,
+        model="root_meter",
+        fields=("tot_wh_exp", "tot_wh_sf"),
+        value_fn=lambda meter: meter.tot_wh_exp * (10**meter.tot_wh_sf),
+        counter=True,
+    ),
+    _Series(
+        key="tot_wh_imp",
+        name="Root Meter Total Energy Imported",
+        unit=UnitOfEnergy.WATT_HOUR,
+        model="root_meter",
+        fields=("tot_wh_imp", "tot_wh_sf"),
+        value_fn=lambda meter: meter.tot_wh_imp * (10**meter.tot_wh_sf),
+        counter=True,
+    ),
+]
+
+_SERIES: list[_Series] = [
+    *_METER_SERIES,
+    *(
+        dataclasses.replace(
+            series,
+            model="extra_meter",
+            name=series.name.replace("Root", "Extra"),
+        )
+        for series in _METER_SERIES
+    ),
+    _Series(
+        key="w",
+        name="Inverter Power",
+        unit=UnitOfPower.WATT,
+        model="inverter",
+        fields=("w", "w_sf"),
+        value_fn=lambda inverter: inverter.w * (10**inverter.w_sf),
+    ),
+    _Series(
+        key="dcw",
+        name="Inverter DC Power",
+        unit=UnitOfPower.WATT,
+        model="inverter",
+        fields=("dcw", "dcw_sf"),
+        value_fn=lambda inverter: inverter.dcw * (10**inverter.dcw_sf),
+    ),
+    _Series(
+        key="wh",
+        name="Inverter Energy",
+        unit=UnitOfEnergy.WATT_HOUR,
+        model="inverter",
+        fields=("wh", "wh_sf"),
+        value_fn=lambda inverter: inverter.wh * (10**inverter.wh_sf),
+        counter=True,
+    ),
+    _Series(
+        key="tot_dc_cur",
+        name="Battery Total DC Current",
+        unit=UnitOfElectricCurrent.AMPERE,
+        model="li_battery",
+        fields=("tot_dc_cur", "current_sf"),
+        value_fn=lambda battery: battery.tot_dc_cur * (10**battery.current_sf),
+    ),
+]
+
+# Fields the series are computed from, they have to be read on every refresh, whether
+# or not their sensors are enabled.
+STATISTICS_CONTEXTS: list["FieldsContext"] = [
+    (series.model, series.fields) for series in _SERIES
+]
+
+
+@dataclasses.dataclass(slots=True)
+class _Mean:
+    weighted_sum: float = 0.0
+    duration: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    # Last sample, it holds until the next one arrives.
+    last_at: float | None = None
+    last: float = 0.0
+
+    def hold(self, until: float) -> None:
+        if self.last_at is not None and until > self.last_at:
+            self.weighted_sum += self.last * (until - self.last_at)
+            self.duration += until - self.last_at
+            self.last_at = until
+
+    def add(self, at: float, value: float) -> None:
+        self.hold(at)
+        self.last_at = at
+        self.last = value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def finish(self, start: datetime) -> StatisticData:
+        mean = self.weighted_sum / self.duration if self.duration else self.last
+        return StatisticData(start=start, mean=mean, min=self.min, max=self.max)
+
+    def restart(self) -> None:
+        # The last value carries over into the next period.
+        self.weighted_sum = self.duration = 0.0
+        self.min = self.max = self.last
+
+
+@dataclasses.dataclass(slots=True)
+class _Sum:
+    sum: float = 0.0
+    state: float | None = None
+
+    def add(self, value: float) -> None:
+        if self.state is not None:
+            # A decreasing counter was reset, everything since then is new.
+            self.sum += value - self.state if value >= self.state else value
+        self.state = value
+
+    def finish(self, start: datetime) -> StatisticData:
+        return StatisticData(start=start, state=self.state, sum=self.sum)
+
+
+def _store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    return Store(hass, _STORAGE_VERSION, f"{DOMAIN}.statistics.{entry_id}")
+
+
+async def async_remove(hass: HomeAssistant, entry_id: str) -> None:
+    await _store(hass, entry_id).async_remove()
+
+
+class StatisticsImporter:
+    def __init__(self, hass: HomeAssistant, entry_id: str, title: str) -> None:
+        self._hass = hass
+        self._title = title
+        self._prefix = f"{DOMAIN}:{entry_id.lower()}"
+        # Means of the hour that was in progress when the entry was last unloaded.
+        self._store = _store(hass, entry_id)
+        self._resume: tuple[datetime, dict[str, _Mean]] | None = None
+        self._period_start: datetime | None = None
+        self._means: dict[str, _Mean] = {}
+        self._sums: dict[str, _Sum] = {}
+        # Monotonic time the registers of each series were last sampled at.
+        self._read_at: dict[str, float] = {}
+
+    def _statistic_id(self, series: _Series) -> str:
+        return f"{self._prefix}_{series.model}_{series.key}"
+
+    async def async_load(self) -> None:
+        """Continue the sums of the counters where the last import left off."""
+        for series in _SERIES:
+            if not series.counter:
+                continue
+            statistic_id = self._statistic_id(series)
+            last = await get_instance(self._hass).async_add_executor_job(
+                get_last_statistics,
+                self._hass,
+                1,
+                statistic_id,
+                False,  # noqa: FBT003
+                {"state", "sum"},
+            )
+            if rows := last.get(statistic_id):
+                self._sums[statistic_id] = _Sum(
+                    sum=rows[0].get("sum") or 0.0, state=rows[0].get("state")
+                )
+
+        if (stored := await self._store.async_load()) is not None and (
+            period_start := dt_util.parse_datetime(stored["period_start"])
+        ) is not None:
+            self._resume = (
+                period_start,
+                {
+                    statistic_id: _Mean(
+                        weighted_sum=weighted_sum, duration=duration, min=low, max=high
+                    )
+                    for statistic_id, (weighted_sum, duration, low, high) in stored[
+                        "means"
+                    ].items()
+                },
+            )
+
+    async def async_flush(self) -> None:
+        """Import the hour in progress and keep its means for the next load.
+
+        The sums continue from the imported statistics anyway, but the means can't
+        be combined from them again.
+        """
+        if self._period_start is None:
+            return
+        now = dt_util.utcnow().timestamp()
+        for mean in self._means.values():
+            mean.hold(now)
+        self._import()
+        await self._store.async_save(
+            {
+                "period_start": self._period_start.isoformat(),
+                "means": {
+                    statistic_id: [mean.weighted_sum, mean.duration, mean.min, mean.max]
+                    for statistic_id, mean in self._means.items()
+                    if mean.last_at is not None
+                },
+            }
+        )
+
+    @callback
+    def add_sample(
+        self,
+        data: "E3dcData",
+        now: datetime,
+        read_time: Callable[[sunspec.Block, str], float],
+    ) -> None:
+        """Add the series of the snapshot, `read_time` is the one of the client.
+
+        Series whose registers weren't read since the last sample are skipped, a
+        stale value would count as a new sample.
+        """
+        period_start = now.replace(minute=0, second=0, microsecond=0)
+        if self._period_start is not None and period_start != self._period_start:
+            boundary = period_start.timestamp()
+            for mean in self._means.values():
+                mean.hold(boundary)
+            self._import()
+            for mean in self._means.values():
+                mean.restart()
+        elif self._period_start is None and self._resume is not None:
+            resume_start, means = self._resume
+            self._resume = None
+            if resume_start == period_start:
+                # Continued within the same hour, the downtime isn't part of the mean.
+                self._means = means
+        self._period_start = period_start
+
+        at = now.timestamp()
+        for series in _SERIES:
+            if (model := getattr(data, series.model)) is None:
+                continue
+            statistic_id = self._statistic_id(series)
+            read_at = read_time(series.model, series.key)
+            if read_at <= self._read_at.get(statistic_id, 0.0):
+                continue
+            self._read_at[statistic_id] = read_at
+            value = float(series.value_fn(model))
+            if series.counter:
+                self._sums.setdefault(statistic_id, _Sum()).add(value)
+            else:
+                self._means.setdefault(statistic_id, _Mean()).add(at, value)
+
+    def _import(self) -> None:
+        assert self._period_start is not None  # noqa: S101
+        start = self._period_start
+        for series in _SERIES:
+            statistic_id = self._statistic_id(series)
+            if series.counter:
+                if (total := self._sums.get(statistic_id)) is None:
+                    continue
+                statistic = total.finish(start)
+            else:
+                if (mean := self._means.get(statistic_id)) is None:
+                    continue
+                statistic = mean.finish(start)
+
+            metadata = StatisticMetaData(
+                mean_type=(
+                    StatisticMeanType.NONE
+                    if series.counter
+                    else StatisticMeanType.ARITHMETIC
+                ),
+                has_sum=series.counter,
+                name=f"{self._title} {series.name}",
+                source=DOMAIN,
+                statistic_id=statistic_id,
+                unit_of_measurement=series.unit,
+            )
+            async_add_external_statistics(self._hass, metadata, [statistic])
+        _LOGGER.debug("Imported statistics for %s", start)
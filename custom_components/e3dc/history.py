@@ -0,0 +1,117 @@
+import array
+import bisect
+import math
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Any
+
+from .api import sunspec
+
+if TYPE_CHECKING:
+    from .coordinator import E3dcData
+
+_MODELS: tuple[sunspec.Block, ...] = (
+    "storage",
+    "root_meter",
+    "extra_meter",
+    "inverter",
+    "li_battery",
+    "mppt",
+)
+
+
+def _sample_fields(model: Any) -> list[str]:  # noqa: ANN401
+    # Text fields aren't samples.
+    return [
+        field
+        for field in model.value_fields()
+        if isinstance(getattr(model, field), int | float)
+    ]
+
+
+class SampleHistory:
+    """Fixed-size ring buffer of the decoded model fields, stored column-wise.
+
+    Every column is a preallocated array of doubles, so the memory use only depends
+    on the capacity and no objects are created per sample. Values are stored with
+    their scale factors applied, enums and flags as their integer values. Models
+    get their columns when they first appear, earlier samples of them are NaN.
+
+    Only the fields of enabled entities are read on every refresh, fields that weren't
+    read since the previous sample are NaN as well instead of repeating a stale value.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._times = array.array("d", bytes(8 * capacity))
+        self._columns: dict[str, array.array[float]] = {}
+        # Per model that appeared so far: its fields, their column names and columns.
+        self._models: dict[str, list[tuple[str, str, array.array[float]]]] = {}
+        # Monotonic time the field of each column was last sampled at.
+        self._read_at: dict[str, float] = {}
+        self._next = 0
+        self._size = 0
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._columns)
+
+    def _add_columns(
+        self,
+        model_name: str,
+        model: Any,  # noqa: ANN401
+    ) -> list[tuple[str, str, array.array[float]]]:
+        columns = []
+        for field in _sample_fields(model):
+            name = f"{model_name}.{field}"
+            column = self._columns[name] = array.array("d", [math.nan]) * self._capacity
+            columns.append((field, name, column))
+        self._models[model_name] = columns
+        return columns
+
+    def append(
+        self,
+        timestamp: float,
+        data: "E3dcData",
+        read_time: Callable[[sunspec.Block, str], float],
+    ) -> None:
+        """Add a sample, `read_time` is the one of the client."""
+        index = self._next
+        self._times[index] = timestamp
+        for model_name in _MODELS:
+            model = getattr(data, model_name)
+            if (columns := self._models.get(model_name)) is None:
+                if model is None:
+                    continue
+                columns = self._add_columns(model_name, model)
+            for field, name, column in columns:
+                if model is None:
+                    column[index] = math.nan
+                    continue
+                read_at = read_time(model_name, field)
+                if read_at > self._read_at.get(name, 0.0):
+                    self._read_at[name] = read_at
+                    column[index] = model.scaled(field)
+                else:
+                    column[index] = math.nan
+
+        self._next = (index + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def _ordered(self, values: array.array[float]) -> array.array[float]:
+        if self._size < self._capacity:
+            return values[: self._size]
+        return values[self._next :] + values[: self._next]
+
+    def query(
+        self, start: float, end: float, columns: Iterable[str] | None = None
+    ) -> tuple[array.array[float], dict[str, array.array[float]]]:
+        """Samples with `start <= timestamp <= end`, oldest first."""
+        times = self._ordered(self._times)
+        lo = bisect.bisect_left(times, start)
+        hi = bisect.bisect_right(times, end)
+        names = self._columns if columns is None else columns
+        return times[lo:hi], {
+            name: self._ordered(self._columns[name])[lo:hi]
+            for name in names
+            if name in self._columns
+        }
@@ -0,0 +1,161 @@
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import hdrs, web
+from homeassistant.components.http import KEY_HASS, HomeAssistantView
+
+from .api import sunspec
+from .const import CONF_METRICS, DOMAIN
+
+if TYPE_CHECKING:
+    from .coordinator import E3dcCoordinator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_MODELS = ("storage", "root_meter", "extra_meter", "inverter", "li_battery", "mppt")
+
+# Metric family name mapped to its sample lines.
+type _Families = dict[str, list[str]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(**labels: Any) -> str:  # noqa: ANN401
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+def _add_model(
+    families: _Families,
+    prefix: str,
+    labels: str,
+    model: sunspec._Model,
+    scale_from: sunspec._Model | None = None,
+) -> None:
+    # The scale factors are already applied.
+    for field in model.value_fields():
+        if isinstance(value := model.scaled(field, scale_from), str):
+            continue
+        value = float(value)
+        families.setdefault(f"{prefix}_{field}", []).append(
+            f"{prefix}_{field}{{{labels}}} {value!r}"
+        )
+
+
+def _render_entry(coordinator: "E3dcCoordinator") -> _Families:
+    entry = coordinator.config_entry
+    labels = _labels(entry=entry.entry_id)
+    families: _Families = {}
+
+    def add(name: str, value: float | None) -> None:
+        if value is None:
+            return
+        families[f"e3dc_{name}"] = [f"e3dc_{name}{{{labels}}} {float(value)!r}"]
+
+    add("up", coordinator.last_update_success)
+    add("updates_total", coordinator.update_count)
+    add("update_failures_total", coordinator.update_failures)
+    add("update_duration_seconds", coordinator.update_duration)
+    add("publish_duration_seconds", coordinator.publish_duration)
+    add("publish_seconds_total", coordinator.publish_seconds_total)
+    add("poll_drift_seconds", coordinator.timing.drift)
+    add("poll_jitter_seconds", coordinator.timing.jitter)
+    add("state_writes_total", coordinator.state_writes)
+    add("suppressed_state_writes_total", coordinator.suppressed_state_writes)
+
+    if (data := coordinator.data) is None:
+        return families
+
+    common = data.common
+    info_labels = _labels(
+        entry=entry.entry_id,
+        title=entry.title,
+        manufacturer=common.manufacturer,
+        model=common.model,
+        options=common.options,
+        version=common.version,
+        serial_number=common.serial_number,
+    )
+    families["e3dc_info"] = [f"e3dc_info{{{info_labels}}} 1.0"]
+
+    for model_name in _MODELS:
+        if (model := getattr(data, model_name)) is None:
+            continue
+        _add_model(families, f"e3dc_{model_name}", labels, model)
+        if not isinstance(model, sunspec.RepeatingModel):
+            continue
+        # e.g. e3dc_li_battery_string_cur{string="0"}
+        module_name = model.MODULES.removesuffix("s")
+        for index, module in enumerate(getattr(model, model.MODULES)):
+            _add_model(
+                families,
+                f"e3dc_{model_name}_{module_name}",
+                _labels(entry=entry.entry_id, **{module_name: index}),
+                module,
+                model,
+            )
+    return families
+
+
+class E3dcMetricsView(HomeAssistantView):
+    """Prometheus text exposition of the entries that have metrics enabled.
+
+    Rendering happens straight from the coordinator snapshots. Every entry is
+    rendered once per refresh and the combined text is reused until one of the
+    entries refreshes again.
+    """
+
+    url = "/api/e3dc/metrics"
+    name = "api:e3dc:metrics"
+
+    def __init__(self) -> None:
+        # Keyed by entry ID, with the update count the families were rendered at.
+        self._entries: dict[str, tuple[int, _Families]] = {}
+        self._text: tuple[tuple[tuple[str, int], ...], bytes] | None = None
+
+    def _families(self, coordinator: "E3dcCoordinator") -> _Families:
+        entry_id = coordinator.config_entry.entry_id
+        cached = self._entries.get(entry_id)
+        if cached is None or cached[0] != coordinator.update_count:
+            cached = self._entries[entry_id] = (
+                coordinator.update_count,
+                _render_entry(coordinator),
+            )
+        return cached[1]
+
+    def render(self, coordinators: list["E3dcCoordinator"]) -> bytes:
+        key = tuple((c.config_entry.entry_id, c.update_count) for c in coordinators)
+        if self._text is not None and self._text[0] == key:
+            return self._text[1]
+
+        families: _Families = {}
+        for coordinator in coordinators:
+            for name, lines in self._families(coordinator).items():
+                families.setdefault(name, []).extend(lines)
+
+        out: list[str] = []
+        for name, lines in families.items():
+            out.append(
+                f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}"
+            )
+            out.extend(lines)
+        out.append("")
+        text = "\n".join(out).encode()
+
+        # Drop entries that were unloaded.
+        active = {entry_id for entry_id, _ in key}
+        for entry_id in self._entries.keys() - active:
+            del self._entries[entry_id]
+        self._text = (key, text)
+        return text
+
+    async def get(self, request: web.Request) -> web.Response:
+        hass = request.app[KEY_HASS]
+        coordinators = [
+            entry.runtime_data
+            for entry in hass.config_entries.async_loaded_entries(DOMAIN)
+            if entry.options.get(CONF_METRICS, False)
+        ]
+        return web.Response(
+            body=self.render(coordinators), headers={hdrs.CONTENT_TYPE: CONTENT_TYPE}
+        )
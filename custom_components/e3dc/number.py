@@ -0,0 +1,112 @@
+from typing import override
+
+from homeassistant.components.number import (
+    NumberDeviceClass,
+    NumberEntity,
+    NumberEntityDescription,
+    NumberMode,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfPower
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
+
+from .api import sunspec
+from .coordinator import E3dcCoordinator, E3dcEntity
+
+# The keys are the storage control fields.
+_STORAGE_NUMBERS: list[NumberEntityDescription] = [
+    NumberEntityDescription(
+        key="w_max_cha_rte",
+        device_class=NumberDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        native_min_value=0,
+        native_max_value=100_000,
+        mode=NumberMode.BOX,
+        entity_category=EntityCategory.CONFIG,
+    ),
+    NumberEntityDescription(
+        key="w_max_dis_cha_rte",
+        device_class=NumberDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        native_min_value=0,
+        native_max_value=100_000,
+        mode=NumberMode.BOX,
+        entity_category=EntityCategory.CONFIG,
+    ),
+    NumberEntityDescription(
+        key="soc_np_max_pct",
+        native_unit_of_measurement=PERCENTAGE,
+        native_min_value=0,
+        native_max_value=100,
+        entity_category=EntityCategory.CONFIG,
+    ),
+    NumberEntityDescription(
+        key="soc_np_min_pct",
+        native_unit_of_measurement=PERCENTAGE,
+        native_min_value=0,
+        native_max_value=100,
+        entity_category=EntityCategory.CONFIG,
+    ),
+]
+
+
+async def async_setup_entry(
+    _hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddConfigEntryEntitiesCallback,
+) -> None:
+    coord = config_entry.runtime_data
+    async_add_entities([E3dcNumber(coord, desc) for desc in _STORAGE_NUMBERS])
+
+
+class E3dcNumber(E3dcEntity[NumberEntityDescription], NumberEntity):
+    """Storage setpoint, showing the value read back from the device."""
+
+    def __init__(
+        self,
+        coordinator: E3dcCoordinator,
+        entity_description: NumberEntityDescription,
+    ) -> None:
+        field = entity_description.key
+        fields = (field,)
+        self._sf = sunspec.EnergyStorageBase.SCALE_FACTORS.get(field)
+        if self._sf is not None:
+            fields += (self._sf,)
+        super().__init__(coordinator, entity_description, context=("storage", fields))
+        self._update_native_value()
+        # Value and availability of the last state write.
+        self._written: tuple[float | None, bool] | None = None
+
+    def _update_native_value(self) -> None:
+        storage = self.coordinator.data.storage
+        self._attr_native_value = storage.scaled(self.entity_description.key)
+        if self._sf is not None:
+            # Setpoints are single unsigned registers.
+            self._attr_native_max_value = min(
+                self.entity_description.native_max_value,
+                0xFFFF * 10 ** getattr(storage, self._sf),
+            )
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._written = (self._attr_native_value, self.available)
+
+    @override
+    async def async_set_native_value(self, value: float) -> None:
+        await self.coordinator.async_write_storage({self.entity_description.key: value})
+
+    @callback
+    @override
+    def _handle_coordinator_update(self) -> None:
+        self._update_native_value()
+        # Setpoints rarely change, there's no need to write them every refresh.
+        written = (self._attr_native_value, self.available)
+        if written == self._written:
+            self.coordinator.suppressed_state_writes += 1
+            return
+
+        self._written = written
+        self.coordinator.state_writes += 1
+        super()._handle_coordinator_update()
@@ -0,0 +1,139 @@
+"""Balance of the three phases of the meters and the inverter.
+
+The meters report voltage and power per phase, the inverter voltage and current. The
+missing quantity is derived from the other two, assuming a power factor of 1.
+"""
+
+import dataclasses
+import math
+from collections.abc import Sequence
+from typing import Literal, Self
+
+from .api import sunspec
+
+type Phase = Literal["a", "b", "c"]
+
+PHASES: tuple[Phase, ...] = ("a", "b", "c")
+
+# Fields the analysis reads, including the scale factors.
+METER_FIELDS = (
+    *(f"ph_vph_{phase}" for phase in PHASES),
+    "v_sf",
+    *(f"wph_{phase}" for phase in PHASES),
+    "w_sf",
+)
+INVERTER_FIELDS = (
+    *(f"ph_vph_{phase}" for phase in PHASES),
+    "v_sf",
+    *(f"aph_{phase}" for phase in PHASES),
+    "a_sf",
+)
+
+# Below this mean current in A the current unbalance is mostly measurement noise.
+_MIN_MEAN_CURRENT = 1.0
+
+
+def _unbalance(values: Sequence[float]) -> float:
+    """Largest deviation from the mean in % of the mean, as defined by NEMA."""
+    mean = math.fsum(values) / len(values)
+    return 100 * max(abs(value - mean) for value in values) / mean
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class PhaseStats:
+    # Highest minus lowest phase power in W.
+    power_imbalance: float
+    voltage_unbalance: float | None
+    current_unbalance: float | None
+    # Phase carrying the highest current.
+    max_current_phase: Phase
+    # Fuse rating minus the highest phase current in A, if a rating is configured.
+    current_headroom: float | None
+
+    @classmethod
+    def from_phases(
+        cls,
+        voltages: Sequence[float],
+        currents: Sequence[float],
+        powers: Sequence[float],
+        fuse_rating: float | None,
+    ) -> Self:
+        max_current = max(currents)
+        return cls(
+            power_imbalance=max(powers) - min(powers),
+            voltage_unbalance=_unbalance(voltages) if min(voltages) > 0 else None,
+            current_unbalance=(
+                _unbalance(currents)
+                if math.fsum(currents) / len(currents) >= _MIN_MEAN_CURRENT
+                else None
+            ),
+            max_current_phase=PHASES[currents.index(max_current)],
+            current_headroom=(
+                fuse_rating - max_current if fuse_rating is not None else None
+            ),
+        )
+
+    @classmethod
+    def from_meter(cls, meter: sunspec.AbcnMeter, fuse_rating: float | None) -> Self:
+        v_scale = 10**meter.v_sf
+        w_scale = 10**meter.w_sf
+        voltages = [
+            meter.ph_vph_a * v_scale,
+            meter.ph_vph_b * v_scale,
+            meter.ph_vph_c * v_scale,
+        ]
+        powers = [meter.wph_a * w_scale, meter.wph_b * w_scale, meter.wph_c * w_scale]
+        currents = [
+            abs(power) / voltage if voltage > 0 else 0.0
+            for power, voltage in zip(powers, voltages, strict=True)
+        ]
+        return cls.from_phases(voltages, currents, powers, fuse_rating)
+
+    @classmethod
+    def from_inverter(
+        cls, inverter: sunspec.Inverter, fuse_rating: float | None
+    ) -> Self:
+        v_scale = 10**inverter.v_sf
+        a_scale = 10**inverter.a_sf
+        voltages = [
+            inverter.ph_vph_a * v_scale,
+            inverter.ph_vph_b * v_scale,
+            inverter.ph_vph_c * v_scale,
+        ]
+        currents = [
+            inverter.aph_a * a_scale,
+            inverter.aph_b * a_scale,
+            inverter.aph_c * a_scale,
+        ]
+        powers = [
+            voltage * current
+            for voltage, current in zip(voltages, currents, strict=True)
+        ]
+        return cls.from_phases(voltages, currents, powers, fuse_rating)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class PhaseData:
+    """Phase balance of every model with phases, computed once per refresh."""
+
+    root_meter: PhaseStats
+    inverter: PhaseStats
+    extra_meter: PhaseStats | None
+
+    @classmethod
+    def analyze(
+        cls,
+        root_meter: sunspec.AbcnMeter,
+        inverter: sunspec.Inverter,
+        extra_meter: sunspec.AbcnMeter | None,
+        fuse_rating: float | None,
+    ) -> Self:
+        return cls(
+            root_meter=PhaseStats.from_meter(root_meter, fuse_rating),
+            inverter=PhaseStats.from_inverter(inverter, fuse_rating),
+            extra_meter=(
+                PhaseStats.from_meter(extra_meter, fuse_rating)
+                if extra_meter is not None
+                else None
+            ),
+        )
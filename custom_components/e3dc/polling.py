@@ -0,0 +1,118 @@
+import math
+import statistics
+from collections import deque
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from .api import sunspec
+
+if TYPE_CHECKING:
+    from .coordinator import E3dcData, FieldsContext
+
+# Fields the activity is judged by, they have to be read on every refresh.
+ACTIVITY_CONTEXTS: list["FieldsContext"] = [
+    ("root_meter", ("w", "w_sf")),
+    ("inverter", ("st",)),
+    ("storage", ("cha_st",)),
+]
+
+_IDLE_INVERTER_STATES = frozenset(
+    {
+        sunspec.Inverter.St.OFF,
+        sunspec.Inverter.St.SLEEPING,
+        sunspec.Inverter.St.STANDBY,
+    }
+)
+_IDLE_CHARGE_STATES = frozenset(
+    {
+        sunspec.EnergyStorageBase.ChaSt.OFF,
+        sunspec.EnergyStorageBase.ChaSt.EMPTY,
+        sunspec.EnergyStorageBase.ChaSt.FULL,
+        sunspec.EnergyStorageBase.ChaSt.HOLDING,
+    }
+)
+# Grid power changes and standard deviations below this many W count as idle.
+_POWER_THRESHOLD = 50.0
+# Weight of the latest sample in the moving grid power mean and variance.
+_ALPHA = 0.3
+
+
+class AdaptiveInterval:
+    """Poll interval that backs off while the system is idle.
+
+    The system is idle while the inverter sleeps, the battery neither charges nor
+    discharges and the grid power is steady. The interval doubles with every idle
+    refresh up to `maximum` and drops back to `minimum` as soon as anything changes.
+    """
+
+    def __init__(self, minimum: timedelta, maximum: timedelta) -> None:
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.interval = minimum
+        self._mean: float | None = None
+        self._variance = 0.0
+
+    def update(self, data: "E3dcData") -> timedelta:
+        power = data.root_meter.scaled("w")
+        if self._mean is None:
+            self._mean = power
+        deviation = power - self._mean
+        self._mean += _ALPHA * deviation
+        self._variance = (1 - _ALPHA) * (self._variance + _ALPHA * deviation**2)
+
+        idle = (
+            data.inverter.st in _IDLE_INVERTER_STATES
+            and data.storage.cha_st in _IDLE_CHARGE_STATES
+            and abs(deviation) < _POWER_THRESHOLD
+            and math.sqrt(self._variance) < _POWER_THRESHOLD
+        )
+        if idle:
+            self.interval = min(2 * self.interval, self.maximum)
+        else:
+            self.interval = self.minimum
+        return self.interval
+
+
+class PollTiming:
+    """Spacing of the samples of consecutive scheduled refreshes.
+
+    The deviation of every spacing from the update interval it was scheduled with is
+    kept for the last `size` refreshes. Their mean is the drift, their standard
+    deviation the jitter.
+    """
+
+    def __init__(self, size: int = 100) -> None:
+        self._deviations: deque[float] = deque(maxlen=size)
+        self._last: float | None = None
+        self.last_spacing: float | None = None
+
+    def add_sample(self, timestamp: float, interval: float, *, scheduled: bool) -> None:
+        """Record the monotonic sample time of a refresh.
+
+        Refreshes that weren't scheduled only serve as the start of the next spacing,
+        since the schedule restarts after every refresh.
+        """
+        if scheduled and self._last is not None:
+            self.last_spacing = timestamp - self._last
+            self._deviations.append(self.last_spacing - interval)
+        self._last = timestamp
+
+    @property
+    def drift(self) -> float | None:
+        if not self._deviations:
+            return None
+        return statistics.fmean(self._deviations)
+
+    @property
+    def jitter(self) -> float | None:
+        if len(self._deviations) < 2:  # noqa: PLR2004
+            return None
+        return statistics.pstdev(self._deviations)
+
+    def as_dict(self) -> dict[str, float | int | None]:
+        return {
+            "samples": len(self._deviations),
+            "last_spacing": self.last_spacing,
+            "drift": self.drift,
+            "jitter": self.jitter,
+        }
@@ -0,0 +1,82 @@
+"""Connections handed from the config flow to the coordinator.
+
+The config flow connects to validate a device and reads its Common model. Instead of
+closing that connection, it is parked here so that the coordinator set up for the new
+entry right after can adopt it along with the Common model. Connections that aren't
+adopted are closed after a short time, the device only accepts a few of them.
+"""
+
+import logging
+from datetime import timedelta
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util.hass_dict import HassKey
+
+from .api import sunspec
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+_DATA_POOL: HassKey["ConnectionPool"] = HassKey(f"{DOMAIN}_pool")
+
+_IDLE_TIMEOUT = timedelta(minutes=2)
+
+
+class ConnectionPool:
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        # Keyed by host, with the callback that cancels the idle timeout.
+        self._connections: dict[
+            str, tuple[sunspec.E3dc, sunspec.Common, CALLBACK_TYPE]
+        ] = {}
+
+    @callback
+    def async_release(
+        self, host: str, client: sunspec.E3dc, common: sunspec.Common
+    ) -> None:
+        """Park a validated connection until it's adopted or idle for too long."""
+        self._async_close(host)
+
+        @callback
+        def expire(_now: object) -> None:
+            _LOGGER.debug("Closing idle connection to %s", host)
+            self._connections.pop(host, None)
+            client.close()
+
+        cancel = async_call_later(self._hass, _IDLE_TIMEOUT, expire)
+        self._connections[host] = (client, common, cancel)
+
+    @callback
+    def async_adopt(self, host: str) -> tuple[sunspec.E3dc, sunspec.Common] | None:
+        """Take over the connection to the host, if there is a usable one."""
+        if (pooled := self._connections.pop(host, None)) is None:
+            return None
+        client, common, cancel = pooled
+        cancel()
+        if not client.connected:
+            client.close()
+            return None
+        return client, common
+
+    @callback
+    def _async_close(self, host: str) -> None:
+        if (pooled := self._connections.pop(host, None)) is not None:
+            client, _, cancel = pooled
+            cancel()
+            client.close()
+
+    @callback
+    def async_close_all(self, _event: Event | None = None) -> None:
+        for host in list(self._connections):
+            self._async_close(host)
+
+
+@callback
+def async_get_pool(hass: HomeAssistant) -> ConnectionPool:
+    # Config flows may run before the integration is set up.
+    if (pool := hass.data.get(_DATA_POOL)) is None:
+        pool = hass.data[_DATA_POOL] = ConnectionPool(hass)
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, pool.async_close_all)
+    return pool
@@ -1,8 +1,14 @@
 import dataclasses
+import enum
+import operator
+import time
 from collections.abc import Callable
-from typing import Literal
+from datetime import timedelta
+from decimal import Decimal
+from typing import override
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorEntityDescription,
@@ -17,123 +23,248 @@ from homeassistant.const import (
     UnitOfPower,
     UnitOfTemperature,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
 from .api import sunspec
-from .coordinator import E3dcCoordinator, E3dcEntity
+from .const import CONF_FUSE_RATING
+from .coordinator import (
+    BATTERY_POWER_CONTEXT,
+    E3dcCoordinator,
+    E3dcData,
+    E3dcEntity,
+)
+from .energy import EnergyCounter
+from .phases import INVERTER_FIELDS, METER_FIELDS, PHASES, PhaseStats
 
 type ValueType = str | int | float | None
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class Deadband:
+    """How far a measurement has to move before its state is written again.
+
+    The band is centered on the last written value, so slow drift is still reported
+    once it adds up. The state is written regardless once `max_silence` has passed.
+    """
+
+    absolute: float = 0.0
+    relative: float = 0.0
+    max_silence: timedelta = timedelta(minutes=5)
+
+    def exceeded(self, reported: float, value: float) -> bool:
+        return abs(value - reported) > max(self.absolute, self.relative * abs(reported))
+
+
+# Only skips writing values that didn't change at all.
+_UNCHANGED = Deadband()
+
+# Deadbands for measurement sensors that don't set their own, by device class.
+_DEVICE_CLASS_DEADBANDS: dict[SensorDeviceClass, Deadband] = {
+    SensorDeviceClass.POWER: Deadband(absolute=10, relative=0.01),
+    SensorDeviceClass.CURRENT: Deadband(absolute=0.1, relative=0.01),
+    SensorDeviceClass.VOLTAGE: Deadband(absolute=1),
+    SensorDeviceClass.TEMPERATURE: Deadband(absolute=0.5),
+}
+
+
+class _StateWriteFilter:
+    """Skips state writes that wouldn't tell anything new.
+
+    Values within the deadband of the last written one, including unchanged ones,
+    aren't written again until `max_silence` has passed. Writes while unavailable
+    and the first one after are never skipped.
+    """
+
+    def __init__(self, deadband: Deadband) -> None:
+        self._deadband = deadband
+        self._reported_value: ValueType = None
+        self._reported_at: float | None = None
+
+    def _suppress(self, value: ValueType, now: float) -> bool:
+        if self._reported_at is None:
+            return False
+        if now - self._reported_at >= self._deadband.max_silence.total_seconds():
+            return False
+        reported = self._reported_value
+        if isinstance(value, int | float) and isinstance(reported, int | float):
+            return not self._deadband.exceeded(reported, value)
+        return value == reported
+
+    def should_write(self, value: ValueType, *, available: bool) -> bool:
+        if not available:
+            self._reported_at = None
+            return True
+        now = time.monotonic()
+        if self._suppress(value, now):
+            return False
+        self._reported_value = value
+        self._reported_at = now
+        return True
+
+
+def _enum_state(value: enum.Enum) -> str | None:
+    # Values the enum doesn't define are unknown, they aren't valid options.
+    if value.name not in type(value).__members__:
+        return None
+    return value.name.lower()
+
+
 @dataclasses.dataclass(kw_only=True, frozen=True)
-class E3dcSensorEntityDescription(SensorEntityDescription):
-    value_fn: Callable[[E3dcCoordinator], ValueType]
+class E3dcSensorEntityDescription[ModelT](SensorEntityDescription):
+    value_fn: Callable[[ModelT], ValueType]
+    # Fields of the model that `value_fn` reads, including scale factors.
+    fields: tuple[str, ...]
+    # Overrides the device class deadband. Only applies to measurements, other
+    # sensors only skip writing unchanged values.
+    deadband: Deadband | None = None
 
 
-_STORAGE_SENSORS = [
+_STORAGE_SENSORS: list[E3dcSensorEntityDescription[sunspec.EnergyStorageBase]] = [
     E3dcSensorEntityDescription(
         key="wh_rtg",
-        value_fn=lambda e3dc: e3dc.storage.wh_rtg * (10**e3dc.storage.wh_rtg_sf),
+        fields=("wh_rtg", "wh_rtg_sf"),
+        value_fn=lambda storage: storage.wh_rtg * (10**storage.wh_rtg_sf),
         device_class=SensorDeviceClass.ENERGY_STORAGE,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
     ),
     E3dcSensorEntityDescription(
         key="w_max_cha_rte",
-        value_fn=lambda e3dc: e3dc.storage.w_max_cha_rte
-        * (10**e3dc.storage.w_max_cha_dis_cha_sf),
+        fields=("w_max_cha_rte", "w_max_cha_dis_cha_sf"),
+        value_fn=lambda storage: (
+            storage.w_max_cha_rte * (10**storage.w_max_cha_dis_cha_sf)
+        ),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
     ),
     E3dcSensorEntityDescription(
         key="w_max_dis_cha_rte",
-        value_fn=lambda e3dc: e3dc.storage.w_max_dis_cha_rte
-        * (10**e3dc.storage.w_max_cha_dis_cha_sf),
+        fields=("w_max_dis_cha_rte", "w_max_cha_dis_cha_sf"),
+        value_fn=lambda storage: (
+            storage.w_max_dis_cha_rte * (10**storage.w_max_cha_dis_cha_sf)
+        ),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
     ),
     E3dcSensorEntityDescription(
         key="soc",
-        value_fn=lambda e3dc: e3dc.storage.soc * (10**e3dc.storage.soc_sf),
+        fields=("soc", "soc_sf"),
+        value_fn=lambda storage: storage.soc * (10**storage.soc_sf),
         device_class=SensorDeviceClass.BATTERY,
         native_unit_of_measurement=PERCENTAGE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="cha_st",
-        value_fn=lambda e3dc: e3dc.storage.cha_st.name.lower(),
+        fields=("cha_st",),
+        value_fn=lambda storage: _enum_state(storage.cha_st),
         device_class=SensorDeviceClass.ENUM,
         options=[v.name.lower() for v in sunspec.EnergyStorageBase.ChaSt],
     ),
     E3dcSensorEntityDescription(
         key="loc_rem_ctl",
-        value_fn=lambda e3dc: e3dc.storage.loc_rem_ctl.name.lower(),
+        fields=("loc_rem_ctl",),
+        value_fn=lambda storage: _enum_state(storage.loc_rem_ctl),
         device_class=SensorDeviceClass.ENUM,
         options=[v.name.lower() for v in sunspec.EnergyStorageBase.LocRemCtl],
     ),
 ]
 
-_INVERTER_SENSORS = [
+
+@dataclasses.dataclass(kw_only=True, frozen=True)
+class E3dcEnergySensorEntityDescription(SensorEntityDescription):
+    value_fn: Callable[[EnergyCounter], float]
+
+
+_BATTERY_ENERGY_SENSORS: list[E3dcEnergySensorEntityDescription] = [
+    E3dcEnergySensorEntityDescription(
+        key="battery_energy_charged",
+        value_fn=lambda energy: energy.positive,
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
+        suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    E3dcEnergySensorEntityDescription(
+        key="battery_energy_discharged",
+        value_fn=lambda energy: energy.negative,
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
+        suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+]
+
+_INVERTER_SENSORS: list[E3dcSensorEntityDescription[sunspec.Inverter]] = [
     E3dcSensorEntityDescription(
         key="a",
-        value_fn=lambda e3dc: e3dc.inverter.a * (10**e3dc.inverter.a_sf),
+        fields=("a", "a_sf"),
+        value_fn=lambda inverter: inverter.a * (10**inverter.a_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="aph_a",
-        value_fn=lambda e3dc: e3dc.inverter.aph_a * (10**e3dc.inverter.a_sf),
+        fields=("aph_a", "a_sf"),
+        value_fn=lambda inverter: inverter.aph_a * (10**inverter.a_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="aph_b",
-        value_fn=lambda e3dc: e3dc.inverter.aph_b * (10**e3dc.inverter.a_sf),
+        fields=("aph_b", "a_sf"),
+        value_fn=lambda inverter: inverter.aph_b * (10**inverter.a_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="aph_c",
-        value_fn=lambda e3dc: e3dc.inverter.aph_c * (10**e3dc.inverter.a_sf),
+        fields=("aph_c", "a_sf"),
+        value_fn=lambda inverter: inverter.aph_c * (10**inverter.a_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="ph_vph_a",
-        value_fn=lambda e3dc: e3dc.inverter.ph_vph_a * (10**e3dc.inverter.v_sf),
+        fields=("ph_vph_a", "v_sf"),
+        value_fn=lambda inverter: inverter.ph_vph_a * (10**inverter.v_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="ph_vph_b",
-        value_fn=lambda e3dc: e3dc.inverter.ph_vph_b * (10**e3dc.inverter.v_sf),
+        fields=("ph_vph_b", "v_sf"),
+        value_fn=lambda inverter: inverter.ph_vph_b * (10**inverter.v_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="ph_vph_c",
-        value_fn=lambda e3dc: e3dc.inverter.ph_vph_c * (10**e3dc.inverter.v_sf),
+        fields=("ph_vph_c", "v_sf"),
+        value_fn=lambda inverter: inverter.ph_vph_c * (10**inverter.v_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="w",
-        value_fn=lambda e3dc: e3dc.inverter.w * (10**e3dc.inverter.w_sf),
+        fields=("w", "w_sf"),
+        value_fn=lambda inverter: inverter.w * (10**inverter.w_sf),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="wh",
-        value_fn=lambda e3dc: e3dc.inverter.wh * (10**e3dc.inverter.wh_sf),
+        fields=("wh", "wh_sf"),
+        value_fn=lambda inverter: inverter.wh * (10**inverter.wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
@@ -141,102 +272,111 @@ _INVERTER_SENSORS = [
     ),
     E3dcSensorEntityDescription(
         key="dca",
-        value_fn=lambda e3dc: e3dc.inverter.dca * (10**e3dc.inverter.dca_sf),
+        fields=("dca", "dca_sf"),
+        value_fn=lambda inverter: inverter.dca * (10**inverter.dca_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="dcv",
-        value_fn=lambda e3dc: e3dc.inverter.dcv * (10**e3dc.inverter.dcv_sf),
+        fields=("dcv", "dcv_sf"),
+        value_fn=lambda inverter: inverter.dcv * (10**inverter.dcv_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="dcw",
-        value_fn=lambda e3dc: e3dc.inverter.dcw * (10**e3dc.inverter.dcw_sf),
+        fields=("dcw", "dcw_sf"),
+        value_fn=lambda inverter: inverter.dcw * (10**inverter.dcw_sf),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="tmp_cab",
-        value_fn=lambda e3dc: e3dc.inverter.tmp_cab * (10**e3dc.inverter.tmp_sf),
+        fields=("tmp_cab", "tmp_sf"),
+        value_fn=lambda inverter: inverter.tmp_cab * (10**inverter.tmp_sf),
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=UnitOfTemperature.CELSIUS,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="tmp_snk",
-        value_fn=lambda e3dc: e3dc.inverter.tmp_snk * (10**e3dc.inverter.tmp_sf),
+        fields=("tmp_snk", "tmp_sf"),
+        value_fn=lambda inverter: inverter.tmp_snk * (10**inverter.tmp_sf),
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=UnitOfTemperature.CELSIUS,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="tmp_trns",
-        value_fn=lambda e3dc: e3dc.inverter.tmp_trns * (10**e3dc.inverter.tmp_sf),
+        fields=("tmp_trns", "tmp_sf"),
+        value_fn=lambda inverter: inverter.tmp_trns * (10**inverter.tmp_sf),
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=UnitOfTemperature.CELSIUS,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="tmp_ot",
-        value_fn=lambda e3dc: e3dc.inverter.tmp_ot * (10**e3dc.inverter.tmp_sf),
+        fields=("tmp_ot", "tmp_sf"),
+        value_fn=lambda inverter: inverter.tmp_ot * (10**inverter.tmp_sf),
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=UnitOfTemperature.CELSIUS,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="st",
-        value_fn=lambda e3dc: e3dc.inverter.st.name.lower(),
+        fields=("st",),
+        value_fn=lambda inverter: _enum_state(inverter.st),
         device_class=SensorDeviceClass.ENUM,
         options=[v.name.lower() for v in sunspec.Inverter.St],
     ),
 ]
 
-_BATTERY_SENSORS = [
+_BATTERY_SENSORS: list[E3dcSensorEntityDescription[sunspec.LithiumIonBattery]] = [
     E3dcSensorEntityDescription(
         key="con_str_ct",
-        value_fn=lambda e3dc: e3dc.li_battery.con_str_ct,
+        fields=("con_str_ct",),
+        value_fn=lambda battery: battery.con_str_ct,
     ),
     E3dcSensorEntityDescription(
         key="max_mod_tmp",
-        value_fn=lambda e3dc: e3dc.li_battery.max_mod_tmp
-        * (10**e3dc.li_battery.mod_tmp_sf),
+        fields=("max_mod_tmp", "mod_tmp_sf"),
+        value_fn=lambda battery: battery.max_mod_tmp * (10**battery.mod_tmp_sf),
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=UnitOfTemperature.CELSIUS,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="min_mod_tmp",
-        value_fn=lambda e3dc: e3dc.li_battery.min_mod_tmp
-        * (10**e3dc.li_battery.mod_tmp_sf),
+        fields=("min_mod_tmp", "mod_tmp_sf"),
+        value_fn=lambda battery: battery.min_mod_tmp * (10**battery.mod_tmp_sf),
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=UnitOfTemperature.CELSIUS,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="tot_dc_cur",
-        value_fn=lambda e3dc: e3dc.li_battery.tot_dc_cur
-        * (10**e3dc.li_battery.current_sf),
+        fields=("tot_dc_cur", "current_sf"),
+        value_fn=lambda battery: battery.tot_dc_cur * (10**battery.current_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="max_str_cur",
-        value_fn=lambda e3dc: e3dc.li_battery.max_str_cur
-        * (10**e3dc.li_battery.current_sf),
+        fields=("max_str_cur", "current_sf"),
+        value_fn=lambda battery: battery.max_str_cur * (10**battery.current_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
     ),
     E3dcSensorEntityDescription(
         key="min_str_cur",
-        value_fn=lambda e3dc: e3dc.li_battery.min_str_cur
-        * (10**e3dc.li_battery.current_sf),
+        fields=("min_str_cur", "current_sf"),
+        value_fn=lambda battery: battery.min_str_cur * (10**battery.current_sf),
         device_class=SensorDeviceClass.CURRENT,
         native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
         state_class=SensorStateClass.MEASUREMENT,
@@ -244,119 +384,129 @@ _BATTERY_SENSORS = [
 ]
 
 
-@dataclasses.dataclass(kw_only=True, frozen=True)
-class E3dcMeterSensorEntityDescription(SensorEntityDescription):
-    value_fn: Callable[[sunspec.AbcnMeter], ValueType]
-
-
-_METER_SENSORS = [
-    E3dcMeterSensorEntityDescription(
+_METER_SENSORS: list[E3dcSensorEntityDescription[sunspec.AbcnMeter]] = [
+    E3dcSensorEntityDescription(
         key="ph_vph_a",
+        fields=("ph_vph_a", "v_sf"),
         value_fn=lambda meter: meter.ph_vph_a * (10**meter.v_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="ph_vph_b",
+        fields=("ph_vph_b", "v_sf"),
         value_fn=lambda meter: meter.ph_vph_b * (10**meter.v_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="ph_vph_c",
+        fields=("ph_vph_c", "v_sf"),
         value_fn=lambda meter: meter.ph_vph_c * (10**meter.v_sf),
         device_class=SensorDeviceClass.VOLTAGE,
         native_unit_of_measurement=UnitOfElectricPotential.VOLT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="w",
+        fields=("w", "w_sf"),
         value_fn=lambda meter: meter.w * (10**meter.w_sf),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="wph_a",
+        fields=("wph_a", "w_sf"),
         value_fn=lambda meter: meter.wph_a * (10**meter.w_sf),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="wph_b",
+        fields=("wph_b", "w_sf"),
         value_fn=lambda meter: meter.wph_b * (10**meter.w_sf),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="wph_c",
+        fields=("wph_c", "w_sf"),
         value_fn=lambda meter: meter.wph_c * (10**meter.w_sf),
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_class=SensorStateClass.MEASUREMENT,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_exp",
+        fields=("tot_wh_exp", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_exp * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_exp_ph_a",
+        fields=("tot_wh_exp_ph_a", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_exp_ph_a * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_exp_ph_b",
+        fields=("tot_wh_exp_ph_b", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_exp_ph_b * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_exp_ph_c",
+        fields=("tot_wh_exp_ph_c", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_exp_ph_c * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_imp",
+        fields=("tot_wh_imp", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_imp * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_imp_ph_a",
+        fields=("tot_wh_imp_ph_a", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_imp_ph_a * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_imp_ph_b",
+        fields=("tot_wh_imp_ph_b", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_imp_ph_b * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
         suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
     ),
-    E3dcMeterSensorEntityDescription(
+    E3dcSensorEntityDescription(
         key="tot_wh_imp_ph_c",
+        fields=("tot_wh_imp_ph_c", "tot_wh_sf"),
         value_fn=lambda meter: meter.tot_wh_imp_ph_c * (10**meter.tot_wh_sf),
         device_class=SensorDeviceClass.ENERGY,
         native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
@@ -366,48 +516,388 @@ _METER_SENSORS = [
 ]
 
 
+def _mppt_sensors(index: int) -> list[E3dcSensorEntityDescription[sunspec.Mppt]]:
+    """Sensors of a single tracker of the MPPT model."""
+    prefix = f"{sunspec.Mppt.MODULES}.{index}"
+    placeholders = {"tracker": str(index + 1)}
+
+    def scaled(field: str) -> Callable[[sunspec.Mppt], float]:
+        return lambda mppt: mppt.modules[index].scaled(field, mppt)
+
+    return [
+        E3dcSensorEntityDescription(
+            key=f"mppt_{index}_dca",
+            translation_key="mppt_dca",
+            translation_placeholders=placeholders,
+            fields=(f"{prefix}.dca", "dca_sf"),
+            value_fn=scaled("dca"),
+            device_class=SensorDeviceClass.CURRENT,
+            native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        E3dcSensorEntityDescription(
+            key=f"mppt_{index}_dcv",
+            translation_key="mppt_dcv",
+            translation_placeholders=placeholders,
+            fields=(f"{prefix}.dcv", "dcv_sf"),
+            value_fn=scaled("dcv"),
+            device_class=SensorDeviceClass.VOLTAGE,
+            native_unit_of_measurement=UnitOfElectricPotential.VOLT,
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        E3dcSensorEntityDescription(
+            key=f"mppt_{index}_dcw",
+            translation_key="mppt_dcw",
+            translation_placeholders=placeholders,
+            fields=(f"{prefix}.dcw", "dcw_sf"),
+            value_fn=scaled("dcw"),
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.WATT,
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        E3dcSensorEntityDescription(
+            key=f"mppt_{index}_dcwh",
+            translation_key="mppt_dcwh",
+            translation_placeholders=placeholders,
+            fields=(f"{prefix}.dcwh", "dcwh_sf"),
+            value_fn=scaled("dcwh"),
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
+            suggested_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            state_class=SensorStateClass.TOTAL_INCREASING,
+        ),
+        E3dcSensorEntityDescription(
+            key=f"mppt_{index}_dc_st",
+            translation_key="mppt_dc_st",
+            translation_placeholders=placeholders,
+            fields=(f"{prefix}.dc_st",),
+            value_fn=lambda mppt: _enum_state(mppt.modules[index].dc_st),
+            device_class=SensorDeviceClass.ENUM,
+            options=[v.name.lower() for v in sunspec.Mppt.Module.DcSt],
+        ),
+    ]
+
+
+def _phase_sensors(
+    fields: tuple[str, ...], *, fuse_rating: bool
+) -> list[E3dcSensorEntityDescription[PhaseStats]]:
+    """Phase balance sensors of a meter or the inverter."""
+    sensors: list[E3dcSensorEntityDescription[PhaseStats]] = [
+        E3dcSensorEntityDescription(
+            key="phase_power_imbalance",
+            fields=fields,
+            value_fn=lambda stats: stats.power_imbalance,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.WATT,
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        E3dcSensorEntityDescription(
+            key="voltage_unbalance",
+            fields=fields,
+            value_fn=lambda stats: stats.voltage_unbalance,
+            native_unit_of_measurement=PERCENTAGE,
+            state_class=SensorStateClass.MEASUREMENT,
+            suggested_display_precision=1,
+            deadband=Deadband(absolute=0.1),
+        ),
+        E3dcSensorEntityDescription(
+            key="current_unbalance",
+            fields=fields,
+            value_fn=lambda stats: stats.current_unbalance,
+            native_unit_of_measurement=PERCENTAGE,
+            state_class=SensorStateClass.MEASUREMENT,
+            suggested_display_precision=0,
+            deadband=Deadband(absolute=1),
+        ),
+        E3dcSensorEntityDescription(
+            key="max_current_phase",
+            fields=fields,
+            value_fn=lambda stats: stats.max_current_phase,
+            device_class=SensorDeviceClass.ENUM,
+            options=list(PHASES),
+        ),
+    ]
+    if fuse_rating:
+        sensors.append(
+            E3dcSensorEntityDescription(
+                key="current_headroom",
+                fields=fields,
+                value_fn=lambda stats: stats.current_headroom,
+                device_class=SensorDeviceClass.CURRENT,
+                native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
+                state_class=SensorStateClass.MEASUREMENT,
+                suggested_display_precision=1,
+            )
+        )
+    return sensors
+
+
+def _smoothed_sensors[ModelT](
+    sensors: list[E3dcSensorEntityDescription[ModelT]],
+    block: sunspec.Block,
+    smoothed_fields: tuple[str, ...],
+) -> list[E3dcSensorEntityDescription[dict[str, float]]]:
+    """Smoothed companions of the sensors of the block, see `Smoother`."""
+
+    def smoothed(key: str) -> Callable[[dict[str, float]], float | None]:
+        return lambda values: values.get(key)
+
+    return [
+        dataclasses.replace(
+            desc,
+            key=f"{desc.key}_smoothed",
+            translation_key=f"{desc.key}_smoothed",
+            value_fn=smoothed(f"{block}.{desc.key}"),
+        )
+        for desc in sensors
+        if f"{block}.{desc.key}" in smoothed_fields
+    ]
+
+
 async def async_setup_entry(
     _hass: HomeAssistant,
     config_entry: ConfigEntry,
     async_add_entities: AddConfigEntryEntitiesCallback,
 ) -> None:
     coord = config_entry.runtime_data
-    async_add_entities([E3dcSensor(coord, desc) for desc in _STORAGE_SENSORS])
+    fuse_rating = config_entry.options.get(CONF_FUSE_RATING) is not None
+    smoothed_fields = coord.smoothed_fields
+    async_add_entities(
+        [E3dcSensor(coord, desc, "storage") for desc in _STORAGE_SENSORS]
+    )
+    async_add_entities(
+        [
+            E3dcSensor(coord, desc, "inverter", device_key="inverter")
+            for desc in _INVERTER_SENSORS
+        ]
+    )
+    async_add_entities(
+        [
+            E3dcSensor(
+                coord,
+                desc,
+                "inverter",
+                device_key="inverter",
+                attribute="phases.inverter",
+            )
+            for desc in _phase_sensors(INVERTER_FIELDS, fuse_rating=fuse_rating)
+        ]
+    )
     async_add_entities(
-        [E3dcSensor(coord, desc, device_key="inverter") for desc in _INVERTER_SENSORS]
+        [
+            E3dcSensor(
+                coord, desc, "inverter", device_key="inverter", attribute="smoothed"
+            )
+            for desc in _smoothed_sensors(
+                _INVERTER_SENSORS, "inverter", smoothed_fields
+            )
+        ]
     )
+    if coord.is_present("li_battery"):
+        async_add_entities(
+            [
+                E3dcSensor(coord, desc, "li_battery", device_key="battery")
+                for desc in _BATTERY_SENSORS
+            ]
+        )
+        # Without a battery, DC input minus AC output is just the conversion loss.
+        async_add_entities(
+            [E3dcEnergySensor(coord, desc) for desc in _BATTERY_ENERGY_SENSORS]
+        )
+        async_add_entities(
+            [
+                E3dcSensor(
+                    coord,
+                    desc,
+                    "li_battery",
+                    device_key="battery",
+                    attribute="smoothed",
+                )
+                for desc in _smoothed_sensors(
+                    _BATTERY_SENSORS, "li_battery", smoothed_fields
+                )
+            ]
+        )
+    if (mppt := coord.data.mppt) is not None:
+        async_add_entities(
+            [
+                E3dcSensor(coord, desc, "mppt", device_key="inverter")
+                for index in range(len(mppt.modules))
+                for desc in _mppt_sensors(index)
+            ]
+        )
     async_add_entities(
-        [E3dcSensor(coord, desc, device_key="battery") for desc in _BATTERY_SENSORS]
+        [
+            E3dcSensor(coord, desc, "root_meter", device_key="root_meter")
+            for desc in _METER_SENSORS
+        ]
     )
     async_add_entities(
-        [E3dcMeterSensor(coord, desc, "root_meter") for desc in _METER_SENSORS]
+        [
+            E3dcSensor(
+                coord,
+                desc,
+                "root_meter",
+                device_key="root_meter",
+                attribute="phases.root_meter",
+            )
+            for desc in _phase_sensors(METER_FIELDS, fuse_rating=fuse_rating)
+        ]
     )
     async_add_entities(
-        [E3dcMeterSensor(coord, desc, "extra_meter") for desc in _METER_SENSORS]
+        [
+            E3dcSensor(
+                coord, desc, "root_meter", device_key="root_meter", attribute="smoothed"
+            )
+            for desc in _smoothed_sensors(_METER_SENSORS, "root_meter", smoothed_fields)
+        ]
     )
+    if coord.is_present("extra_meter"):
+        async_add_entities(
+            [
+                E3dcSensor(coord, desc, "extra_meter", device_key="extra_meter")
+                for desc in _METER_SENSORS
+            ]
+        )
+        async_add_entities(
+            [
+                E3dcSensor(
+                    coord,
+                    desc,
+                    "extra_meter",
+                    device_key="extra_meter",
+                    attribute="phases.extra_meter",
+                )
+                for desc in _phase_sensors(METER_FIELDS, fuse_rating=fuse_rating)
+            ]
+        )
+        async_add_entities(
+            [
+                E3dcSensor(
+                    coord,
+                    desc,
+                    "extra_meter",
+                    device_key="extra_meter",
+                    attribute="smoothed",
+                )
+                for desc in _smoothed_sensors(
+                    _METER_SENSORS, "extra_meter", smoothed_fields
+                )
+            ]
+        )
+
+
+class E3dcSensor[ModelT](E3dcEntity[E3dcSensorEntityDescription[ModelT]], SensorEntity):
+    def __init__(
+        self,
+        coordinator: E3dcCoordinator,
+        entity_description: E3dcSensorEntityDescription[ModelT],
+        model: sunspec.Block,
+        *,
+        device_key: str | None = None,
+        attribute: str | None = None,
+    ) -> None:
+        """Sensor of a model, or of the snapshot `attribute` derived from it."""
+        super().__init__(
+            coordinator,
+            entity_description,
+            device_key=device_key,
+            context=(model, entity_description.fields),
+        )
+        # Bind to the model once instead of looking it up on every update.
+        self._get_model: Callable[[E3dcData], ModelT] = operator.attrgetter(
+            attribute or model
+        )
+        self._generation = -1
+        self._update_native_value()
 
+        deadband = None
+        if entity_description.state_class == SensorStateClass.MEASUREMENT:
+            deadband = entity_description.deadband
+            if deadband is None and entity_description.device_class is not None:
+                deadband = _DEVICE_CLASS_DEADBANDS.get(
+                    SensorDeviceClass(entity_description.device_class)
+                )
+        self._write_filter = _StateWriteFilter(deadband or _UNCHANGED)
+
+    def _update_native_value(self) -> None:
+        # The value only changes when the coordinator publishes a new snapshot, so it
+        # is computed once per generation no matter how often the state is read.
+        data = self.coordinator.data
+        if data.generation == self._generation:
+            return
+        self._generation = data.generation
+        self._attr_native_value = self.entity_description.value_fn(
+            self._get_model(data)
+        )
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # The state was written when the entity was added.
+        self._write_filter.should_write(
+            self._attr_native_value, available=self.available
+        )
+
+    @callback
+    @override
+    def _handle_coordinator_update(self) -> None:
+        self._update_native_value()
+        if not self._write_filter.should_write(
+            self._attr_native_value, available=self.available
+        ):
+            self.coordinator.suppressed_state_writes += 1
+            return
+
+        self.coordinator.state_writes += 1
+        super()._handle_coordinator_update()
 
-class E3dcSensor(E3dcEntity[E3dcSensorEntityDescription], SensorEntity):
-    @property
-    def native_value(self) -> ValueType:
-        return self.entity_description.value_fn(self.coordinator)
 
+class E3dcEnergySensor(E3dcEntity[E3dcEnergySensorEntityDescription], RestoreSensor):
+    """Energy counter integrated by the coordinator, continued across restarts."""
 
-class E3dcMeterSensor(E3dcEntity[E3dcMeterSensorEntityDescription], SensorEntity):
     def __init__(
         self,
         coordinator: E3dcCoordinator,
-        entity_description: E3dcMeterSensorEntityDescription,
-        meter: Literal["root_meter", "extra_meter"],
+        entity_description: E3dcEnergySensorEntityDescription,
     ) -> None:
-        super().__init__(coordinator, entity_description, device_key=meter)
-        self._meter = meter
-
-    @property
-    def native_value(self) -> ValueType:
-        meter = (
-            self.coordinator.root_meter
-            if self._meter == "root_meter"
-            else self.coordinator.extra_meter
+        super().__init__(
+            coordinator,
+            entity_description,
+            device_key="battery",
+            context=BATTERY_POWER_CONTEXT,
         )
-        return self.entity_description.value_fn(meter)
+        # The coordinator only counts the energy since it was set up.
+        self._restored = 0.0
+        self._update_native_value()
+        # Doesn't change while the battery is idle.
+        self._write_filter = _StateWriteFilter(_UNCHANGED)
+
+    def _update_native_value(self) -> None:
+        self._attr_native_value = self._restored + self.entity_description.value_fn(
+            self.coordinator.battery_energy
+        )
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and isinstance(last.native_value, int | float | Decimal):
+            self._restored = float(last.native_value)
+            self._update_native_value()
+        self._write_filter.should_write(
+            self._attr_native_value, available=self.available
+        )
+
+    @callback
+    @override
+    def _handle_coordinator_update(self) -> None:
+        self._update_native_value()
+        if not self._write_filter.should_write(
+            self._attr_native_value, available=self.available
+        ):
+            self.coordinator.suppressed_state_writes += 1
+            return
+
+        self.coordinator.state_writes += 1
+        super()._handle_coordinator_update()
@@ -0,0 +1,198 @@
+import cProfile
+import pstats
+from typing import Any
+
+import voluptuous as vol
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .api import sunspec
+from .const import DOMAIN
+from .coordinator import E3dcCoordinator
+
+SERVICE_PROFILE = "profile"
+SERVICE_SET_STORAGE_CONTROL = "set_storage_control"
+SERVICE_READ_REGISTERS = "read_registers"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_CYCLES = "cycles"
+ATTR_TOP = "top"
+ATTR_ADDRESS = "address"
+ATTR_COUNT = "count"
+ATTR_MAX_AGE = "max_age"
+
+# Service fields mapped to the storage control fields they set.
+_STORAGE_CONTROLS = {
+    "max_charge_power": "w_max_cha_rte",
+    "max_discharge_power": "w_max_dis_cha_rte",
+    "max_soc": "soc_np_max_pct",
+    "min_soc": "soc_np_min_pct",
+}
+
+_PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+        vol.Optional(ATTR_CYCLES, default=5): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=1000)
+        ),
+        vol.Optional(ATTR_TOP, default=10): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=100)
+        ),
+    }
+)
+
+_SET_STORAGE_CONTROL_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+            vol.Optional("max_charge_power"): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional("max_discharge_power"): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional("max_soc"): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=100)
+            ),
+            vol.Optional("min_soc"): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=100)
+            ),
+        }
+    ),
+    cv.has_at_least_one_key(*_STORAGE_CONTROLS),
+)
+
+
+def _within_register_map(data: dict[str, Any]) -> dict[str, Any]:
+    if data[ATTR_ADDRESS] + data[ATTR_COUNT] > sunspec.ADDRESS_SPACE:
+        msg = "range ends past the last register"
+        raise vol.Invalid(msg)
+    return data
+
+
+_READ_REGISTERS_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+            vol.Required(ATTR_ADDRESS): vol.All(
+                vol.Coerce(int),
+                vol.Range(min=sunspec.BASE_ADDRESS, max=sunspec.ADDRESS_SPACE - 1),
+            ),
+            vol.Optional(ATTR_COUNT, default=1): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=sunspec.MAX_READ_COUNT)
+            ),
+            vol.Optional(ATTR_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        }
+    ),
+    _within_register_map,
+)
+
+
+@callback
+def async_setup(hass: HomeAssistant) -> None:
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=_PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_STORAGE_CONTROL,
+        _async_set_storage_control,
+        schema=_SET_STORAGE_CONTROL_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_READ_REGISTERS,
+        _async_read_registers,
+        schema=_READ_REGISTERS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+
+def _get_coordinator(hass: HomeAssistant, call: ServiceCall) -> E3dcCoordinator:
+    entry = hass.config_entries.async_get_entry(call.data[ATTR_CONFIG_ENTRY_ID])
+    if (
+        entry is None
+        or entry.domain != DOMAIN
+        or entry.state is not ConfigEntryState.LOADED
+    ):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="entry_not_loaded",
+        )
+    return entry.runtime_data
+
+
+def _save_profile(
+    profile: cProfile.Profile, path: str, top: int
+) -> tuple[float, list[dict[str, Any]]]:
+    profile.dump_stats(path)
+    stats = pstats.Stats(profile)
+    hot_spots = sorted(
+        stats.stats.items(),
+        key=lambda item: item[1][2],
+        reverse=True,
+    )[:top]
+    return stats.total_tt, [
+        {
+            "function": pstats.func_std_string(func),
+            "calls": calls,
+            "total_time": total_time,
+            "cumulative_time": cumulative_time,
+        }
+        for func, (_, calls, total_time, cumulative_time, _) in hot_spots
+    ]
+
+
+async def _async_profile(call: ServiceCall) -> ServiceResponse:
+    hass = call.hass
+    coordinator = _get_coordinator(hass, call)
+    cycles: int = call.data[ATTR_CYCLES]
+    profile = await coordinator.async_profile(cycles)
+
+    timestamp = dt_util.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = hass.config.path(f"e3dc_profile_{timestamp}.prof")
+    total_time, hot_spots = await hass.async_add_executor_job(
+        _save_profile, profile, path, call.data[ATTR_TOP]
+    )
+    return {
+        "path": path,
+        "cycles": cycles,
+        "total_time": total_time,
+        "hot_spots": hot_spots,
+    }
+
+
+async def _async_set_storage_control(call: ServiceCall) -> None:
+    coordinator = _get_coordinator(call.hass, call)
+    await coordinator.async_write_storage(
+        {
+            field: call.data[attr]
+            for attr, field in _STORAGE_CONTROLS.items()
+            if attr in call.data
+        }
+    )
+
+
+async def _async_read_registers(call: ServiceCall) -> ServiceResponse:
+    coordinator = _get_coordinator(call.hass, call)
+    max_age = call.data.get(ATTR_MAX_AGE)
+    if max_age is None and (interval := coordinator.update_interval) is not None:
+        # Whatever the last refresh read.
+        max_age = interval.total_seconds()
+    registers = await coordinator.async_read_registers(
+        call.data[ATTR_ADDRESS], call.data[ATTR_COUNT], max_age or 0.0
+    )
+    return {"address": call.data[ATTR_ADDRESS], "registers": registers}
@@ -0,0 +1,84 @@
+"""Smoothing of noisy measurements over the latest samples.
+
+The samples of all smoothed fields share a single ring buffer, and every refresh
+computes all smoothed values in one pass. This replaces a `filter` or `statistics`
+helper per field, each keeping its own buffer and recording its own states.
+"""
+
+import array
+import math
+import statistics
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    from .coordinator import E3dcData
+
+type Method = Literal["ema", "mean", "median"]
+
+METHODS: tuple[Method, ...] = ("ema", "mean", "median")
+
+# Fields that can be smoothed, as `<block>.<field>`.
+SMOOTHABLE_FIELDS = (
+    "root_meter.w",
+    "extra_meter.w",
+    "inverter.w",
+    "inverter.dcw",
+    "li_battery.tot_dc_cur",
+)
+
+
+class Smoother:
+    """Smooths fields with an EMA, the mean or the median over `window` samples.
+
+    The EMA uses the usual smoothing factor of `2 / (window + 1)`, which gives its
+    samples the same average age as the mean over the window.
+    """
+
+    def __init__(self, method: Method, window: int, fields: Sequence[str]) -> None:
+        self._method = method
+        self._window = window
+        self.fields = tuple(field for field in SMOOTHABLE_FIELDS if field in fields)
+        self._getters = [field.split(".") for field in self.fields]
+        # Sample `i` of field `j` is at `j * window + i`.
+        self._samples = array.array("d", bytes(8 * window * len(self.fields)))
+        self._ema = array.array("d", [math.nan]) * len(self.fields)
+        self._alpha = 2 / (window + 1)
+        self._next = 0
+        self._size = 0
+
+    def add_sample(self, data: "E3dcData") -> dict[str, float]:
+        """Add the fields of the snapshot and return the smoothed values."""
+        window = self._window
+        size = min(self._size + 1, window)
+        smoothed: dict[str, float] = {}
+        for index, (key, (block, field)) in enumerate(
+            zip(self.fields, self._getters, strict=True)
+        ):
+            start = index * window
+            if (model := getattr(data, block)) is None:
+                # Marks the slot as empty, so a stale sample doesn't stay in the window.
+                self._samples[start + self._next] = math.nan
+                continue
+            value = float(model.scaled(field))
+            self._samples[start + self._next] = value
+
+            if self._method == "ema":
+                previous = self._ema[index]
+                if not math.isnan(previous):
+                    value = previous + self._alpha * (value - previous)
+                self._ema[index] = smoothed[key] = value
+                continue
+            samples = [
+                sample
+                for sample in self._samples[start : start + size]
+                if not math.isnan(sample)
+            ]
+            if self._method == "mean":
+                smoothed[key] = math.fsum(samples) / len(samples)
+            else:
+                smoothed[key] = statistics.median(samples)
+
+        self._next = (self._next + 1) % window
+        self._size = size
+        return smoothed
@@ -0,0 +1,71 @@
+import base64
+import sys
+from array import array
+from typing import Any
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+
+from .const import DOMAIN
+
+
+@callback
+def async_setup(hass: HomeAssistant) -> None:
+    websocket_api.async_register_command(hass, ws_get_history)
+
+
+def _encode(values: array[float]) -> str:
+    # Columns are sent as base64 encoded little-endian doubles.
+    if sys.byteorder == "big":
+        values = array("d", values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode()
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "e3dc/history",
+        vol.Required("entry_id"): str,
+        vol.Optional("start_time"): cv.datetime,
+        vol.Optional("end_time"): cv.datetime,
+        vol.Optional("fields"): [str],
+    }
+)
+@callback
+def ws_get_history(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    entry = hass.config_entries.async_get_entry(msg["entry_id"])
+    if (
+        entry is None
+        or entry.domain != DOMAIN
+        or entry.state is not ConfigEntryState.LOADED
+    ):
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "Config entry not loaded"
+        )
+        return
+
+    history = entry.runtime_data.history
+    if history is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_SUPPORTED, "History is disabled"
+        )
+        return
+
+    start = msg["start_time"].timestamp() if "start_time" in msg else 0.0
+    end = msg["end_time"].timestamp() if "end_time" in msg else float("inf")
+    times, columns = history.query(start, end, msg.get("fields"))
+    connection.send_result(
+        msg["id"],
+        {
+            "dtype": "<f8",
+            "time": _encode(times),
+            "fields": {name: _encode(values) for name, values in columns.items()},
+        },
+    )
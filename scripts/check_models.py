@@ -0,0 +1,378 @@
+"""Check the model decoders against their struct formats and benchmark them.
+
+Every model, including the modules of the repeating ones, is checked for:
+
+- layout: the struct format has a value for every field and the field spans cover
+  the struct exactly. Strings are `s`, enums `H`, flags `H` or `L` and scale factors
+  `h`, and every scale factor refers to existing fields.
+- round trip: random register arrays, biased towards the values a device uses for
+  "not implemented" points, are decoded and packed again and have to come out the
+  same. Each field has to match the value decoded from its own registers alone.
+- unknown enum values: values an enum doesn't define decode to `UNKNOWN_<value>`
+  instead of raising.
+
+Then the time and the allocations of a single decode are measured for every model.
+With `--baseline` the results are compared with the ones saved by an earlier
+`--save` and the script exits with status 1 if the time grew by more than
+`--threshold` or there are more allocations than before. Times are only comparable
+on the same machine and Python version, `--ignore-time` only compares the
+allocations, as CI does with `scripts/models_baseline.json`.
+
+Usage: python scripts/check_models.py --baseline models.json [--save] [--ignore-time]
+"""
+
+import argparse
+import dataclasses
+import enum
+import importlib.util
+import json
+import random
+import re
+import string
+import struct
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+
+def _load_sunspec() -> ModuleType:
+    # Loaded by path, importing the package would import Home Assistant, which
+    # isn't needed to check the models.
+    path = Path(__file__).resolve().parent.parent / "custom_components/e3dc/api"
+    spec = importlib.util.spec_from_file_location("sunspec", path / "sunspec.py")
+    assert spec is not None  # noqa: S101
+    assert spec.loader is not None  # noqa: S101
+    module = importlib.util.module_from_spec(spec)
+    # Dataclasses look their module up while the module is executed.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+sunspec = _load_sunspec()
+
+_MODELS: list[type[sunspec.RepeatingModel] | type[Any]] = [
+    sunspec.Common,
+    sunspec.EnergyStorageBase,
+    sunspec.BatteryBase,
+    sunspec.LithiumIonBattery,
+    sunspec.AbcnMeter,
+    sunspec.Inverter,
+    sunspec.Mppt,
+]
+# Modules decoded with each repeating model in the benchmark.
+_BENCHMARK_MODULES = 4
+
+_FORMAT_ITEM = re.compile(r"(\d*)([a-zA-Z?])")
+_EDGE_REGISTERS = (0x0000, 0x0001, 0x7FFF, 0x8000, 0xFFFF)
+
+type _Decoder = Callable[[bytes], Any]
+
+
+def _field_types(model: type[Any]) -> dict[str, Any]:
+    return {
+        field.name: field.type
+        for field in dataclasses.fields(model)
+        if field.default is dataclasses.MISSING
+        and field.default_factory is dataclasses.MISSING
+    }
+
+
+def _codes(model: type[Any]) -> list[tuple[str, int]]:
+    """Format code and repeat count of every struct value, strings as a single one."""
+    codes: list[tuple[str, int]] = []
+    for count, code in _FORMAT_ITEM.findall(model.STRUCT.format):
+        repeat = int(count or 1)
+        if code == "s":
+            codes.append((code, repeat))
+        else:
+            codes.extend((code, 1) for _ in range(repeat))
+    return codes
+
+
+def _expected_codes(field_type: Any, *, scale_factor: bool) -> str | None:  # noqa: ANN401
+    if field_type is str:
+        return "s"
+    if issubclass(field_type, enum.IntFlag):
+        return "HL"
+    if issubclass(field_type, enum.IntEnum):
+        return "H"
+    if scale_factor:
+        return "h"
+    return None
+
+
+def _check_layout(model: type[Any]) -> list[str]:
+    name = model.__qualname__
+    types = _field_types(model)
+    codes = _codes(model)
+    if len(codes) != len(types):
+        return [f"{name}: {len(types)} fields but {len(codes)} struct values"]
+
+    errors: list[str] = []
+    spans = model.field_spans()
+    if sum(count for _, count in spans.values()) != model.STRUCT.size // 2:
+        errors.append(f"{name}: field spans don't cover the struct")
+
+    scale_factors = set(model.SCALE_FACTORS.values())
+    for (field, field_type), (code, _) in zip(types.items(), codes, strict=True):
+        expected = _expected_codes(field_type, scale_factor=field in scale_factors)
+        if expected is not None and code not in expected:
+            errors.append(f"{name}.{field}: format {code}, expected {expected}")
+
+    for field, sf in model.SCALE_FACTORS.items():
+        if field not in types:
+            errors.append(f"{name}: scale factor for unknown field {field}")
+        # Module scale factors are fields of the parent model.
+        owner = _parent(model) or model
+        if sf not in _field_types(owner):
+            errors.append(f"{name}.{field}: unknown scale factor {sf}")
+    return errors
+
+
+def _parent(model: type[Any]) -> type[sunspec.RepeatingModel] | None:
+    return next(
+        (
+            parent
+            for parent in _MODELS
+            if issubclass(parent, sunspec.RepeatingModel) and parent.MODULE is model
+        ),
+        None,
+    )
+
+
+def _random_data(model: type[Any], rng: random.Random) -> bytes:
+    data = bytearray()
+    for code, repeat in _codes(model):
+        if code == "s":
+            # Text padded with NULs, as devices send it.
+            text = "".join(
+                rng.choices(string.ascii_letters + " ./-", k=rng.randint(0, repeat))
+            ).strip()
+            data += text.encode().ljust(repeat, b"\0")
+            continue
+        for _ in range(struct.calcsize(f">{code}") // 2):
+            register = (
+                rng.choice(_EDGE_REGISTERS)
+                if rng.random() < 0.3  # noqa: PLR2004
+                else rng.randrange(0x10000)
+            )
+            data += register.to_bytes(2, "big")
+    return bytes(data)
+
+
+def _repack(model: type[Any], decoded: Any) -> bytes:  # noqa: ANN401
+    values = [getattr(decoded, field) for field in _field_types(model)]
+    return model.STRUCT.pack(
+        *(
+            value.encode().ljust(repeat, b"\0") if code == "s" else int(value)
+            for value, (code, repeat) in zip(values, _codes(model), strict=True)
+        )
+    )
+
+
+def _check_fields(model: type[Any], decoded: Any, data: bytes) -> list[str]:  # noqa: ANN401
+    errors: list[str] = []
+    codes = dict(zip(_field_types(model), _codes(model), strict=True))
+    for field, (offset, count) in model.field_spans().items():
+        raw = data[2 * offset : 2 * (offset + count)]
+        code, repeat = codes[field]
+        value = getattr(decoded, field)
+        if code == "s":
+            matches = value.encode().ljust(repeat, b"\0") == raw
+        else:
+            matches = int(value) == struct.unpack(f">{code}", raw)[0]
+        if not matches:
+            errors.append(f"{model.__qualname__}.{field}: {value!r} from {raw.hex()}")
+        if (
+            isinstance(value, enum.IntEnum)
+            and not isinstance(value, enum.IntFlag)
+            and int(value) not in type(value)._value2member_map_
+            and not value.name.startswith("UNKNOWN_")
+        ):
+            errors.append(f"{model.__qualname__}.{field}: unexpected name {value.name}")
+    return errors
+
+
+def _block_data(model: type[Any], rng: random.Random, modules: int) -> bytes:
+    """Data starting at the length register, with the modules of repeating models."""
+    data = _random_data(model, rng)
+    if issubclass(model, sunspec.RepeatingModel):
+        data += b"".join(_random_data(model.MODULE, rng) for _ in range(modules))
+    return struct.pack(">H", len(data) // 2) + data
+
+
+def _decoder(model: type[Any]) -> _Decoder:
+    if issubclass(model, sunspec.RepeatingModel):
+        return lambda data: model.unpack_block(data, 0)
+    return lambda data: model.unpack_from(data, 2)
+
+
+def _check_round_trip(model: type[Any], rng: random.Random) -> list[str]:
+    modules = rng.randint(0, 3)
+    data = _block_data(model, rng, modules)
+    try:
+        decoded = _decoder(model)(data)
+    except Exception as err:  # noqa: BLE001
+        return [f"{model.__qualname__}: decoding {data.hex()} raised {err!r}"]
+
+    parts = [(model, decoded, data[2 : 2 + model.STRUCT.size])]
+    if issubclass(model, sunspec.RepeatingModel):
+        module_data = data[2 + model.STRUCT.size :]
+        size = model.MODULE.STRUCT.size
+        parts.extend(
+            (model.MODULE, module, module_data[i * size : (i + 1) * size])
+            for i, module in enumerate(getattr(decoded, model.MODULES))
+        )
+        if len(parts) != 1 + modules:
+            return [f"{model.__qualname__}: {len(parts) - 1} of {modules} modules"]
+
+    errors: list[str] = []
+    for part_model, part, part_data in parts:
+        errors.extend(_check_fields(part_model, part, part_data))
+        if _repack(part_model, part) != part_data:
+            errors.append(f"{part_model.__qualname__}: no round trip of {data.hex()}")
+    return errors
+
+
+def _check(examples: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    errors: list[str] = []
+    for model in _MODELS:
+        errors.extend(_check_layout(model))
+        if issubclass(model, sunspec.RepeatingModel):
+            errors.extend(_check_layout(model.MODULE))
+    if errors:
+        # Round trips make no sense with a broken layout.
+        return errors
+
+    for model in _MODELS:
+        for _ in range(examples):
+            if model_errors := _check_round_trip(model, rng):
+                errors.extend(model_errors)
+                break
+    return errors
+
+
+@dataclasses.dataclass
+class Measurement:
+    seconds: float
+    allocations: float
+    bytes: float
+
+
+def _measure(model: type[Any], seed: int) -> Measurement:
+    data = _block_data(model, random.Random(seed), _BENCHMARK_MODULES)
+    decode = _decoder(model)
+
+    timer = timeit.Timer(lambda: decode(data))
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=5, number=number)) / number
+
+    count = 1000
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    decoded = [decode(data) for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    del decoded
+    return Measurement(
+        seconds=seconds,
+        allocations=sum(stat.count_diff for stat in stats) / count,
+        bytes=sum(stat.size_diff for stat in stats) / count,
+    )
+
+
+def _benchmark(seed: int) -> dict[str, Measurement]:
+    return {model.__qualname__: _measure(model, seed) for model in _MODELS}
+
+
+def _regressions(
+    results: dict[str, Measurement],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+    *,
+    ignore_time: bool,
+) -> list[str]:
+    regressions: list[str] = []
+    for name, result in results.items():
+        if (previous := baseline.get(name)) is None:
+            continue
+        for metric, value in dataclasses.asdict(result).items():
+            if ignore_time and metric == "seconds":
+                continue
+            base = previous[metric]
+            # Allocations are deterministic, unlike the time.
+            limit = base + 0.5 if metric == "allocations" else base * threshold
+            if base > 0 and value > limit:
+                regressions.append(
+                    f"{name} {metric}: {value:.3g}, {value / base:.2f}x the baseline"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n")[0])
+    parser.add_argument(
+        "--examples",
+        type=int,
+        default=1000,
+        help="random register arrays to round trip per model",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--baseline", type=Path, help="JSON file with the results to compare with"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="write the results to the baseline file"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="factor by which the time and bytes may exceed the baseline",
+    )
+    parser.add_argument(
+        "--ignore-time",
+        action="store_true",
+        help="only compare the allocations, for a baseline from another machine",
+    )
+    args = parser.parse_args()
+
+    if errors := _check(args.examples, args.seed):
+        print("\n".join(errors))
+        sys.exit(1)
+    print(f"{len(_MODELS)} models, {args.examples} round trips each: ok")
+
+    results = _benchmark(args.seed)
+    print(f"{'model':<20} {'time [us]':>10} {'allocations':>12} {'bytes':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<20} {result.seconds * 1e6:>10.2f} "
+            f"{result.allocations:>12.1f} {result.bytes:>10.0f}"
+        )
+
+    if args.baseline is None:
+        return
+    if args.save:
+        args.baseline.write_text(
+            json.dumps(
+                {name: dataclasses.asdict(r) for name, r in results.items()}, indent=2
+            )
+        )
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if regressions := _regressions(
+        results, baseline, args.threshold, ignore_time=args.ignore_time
+    ):
+        print("\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""Load test many simulated E3/DC devices against a single Home Assistant instance.
+
+The simulated devices are served from a separate process, each on its own port and
+with its own latency, so that they don't compete with Home Assistant for the event
+loop. For every device count a fresh Home Assistant instance is started and a config
+entry is added per device through the config flow. The instance is then left polling
+for a while and the following is reported:
+
+- setup: wall and CPU time to add an entry, mostly entity construction and the
+  first refresh, and the Python memory allocated per entry.
+- polling: CPU time per refresh, the refresh duration reported by the coordinator
+  and the number of state writes and state changes.
+- event loop lag: how late a timer firing every 50 ms runs.
+
+Per entry and per refresh costs should stay flat as the number of devices grows, the
+summary points out the ones that don't.
+
+Usage: python scripts/loadtest.py --devices 1 10 25 50 --duration 60
+"""
+
+import argparse
+import array
+import asyncio
+import contextlib
+import dataclasses
+import enum
+import logging
+import math
+import multiprocessing
+import random
+import socket
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant import auth, bootstrap, loader
+from homeassistant.config_entries import SOURCE_USER, ConfigEntries, ConfigEntryState
+from homeassistant.const import CONF_HOST, EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.setup import async_setup_component
+
+from custom_components.e3dc.api import sunspec
+from custom_components.e3dc.api.server import ModbusTcpServer
+from custom_components.e3dc.const import DOMAIN
+from custom_components.e3dc.coordinator import E3dcCoordinator
+
+_LOGGER = logging.getLogger("loadtest")
+
+_LOOP_LAG_INTERVAL = 0.05
+# Per-entry costs growing by more than this factor are reported as not linear.
+_LINEAR_TOLERANCE = 1.25
+
+# Model ID and length register address of every model in the simulated register map.
+_CHAIN: list[tuple[int, int, type[sunspec._Model] | None]] = [
+    (1, 40003, sunspec.Common),
+    (801, 40071, sunspec.EnergyStorageBase),
+    (802, 40097, sunspec.BatteryBase),
+    (803, 40117, sunspec.LithiumIonBattery),
+    (103, 40151, sunspec.Inverter),
+    (203, 40203, sunspec.AbcnMeter),
+    (203, 40310, sunspec.AbcnMeter),
+]
+_END_ADDRESS = 40417
+
+# Fields that wander around between polls: address of the model, field and bounds.
+_DYNAMIC_FIELDS = [
+    (40071, "soc", 0, 100),
+    (40151, "w", 0, 8000),
+    (40151, "dcw", 0, 9000),
+    (40151, "dca", 0, 300),
+    *((40151, f"ph_vph_{phase}", 225, 240) for phase in "abc"),
+    (40151, "tmp_cab", 20, 60),
+    *(
+        (address, field, low, high)
+        for address in (40203, 40310)
+        for field, low, high in (
+            ("w", -5000, 5000),
+            ("wph_a", -2000, 2000),
+            ("wph_b", -2000, 2000),
+            ("wph_c", -2000, 2000),
+            ("ph_vph_a", 225, 240),
+            ("ph_vph_b", 225, 240),
+            ("ph_vph_c", 225, 240),
+        )
+    ),
+    (40117, "tot_dc_cur", -50, 50),
+    (40117, "max_mod_tmp", 20, 40),
+]
+
+
+def _default_values(model: type[sunspec._Model]) -> list[object]:
+    values: list[object] = []
+    for field in dataclasses.fields(model):
+        if field.default_factory is not dataclasses.MISSING:
+            continue
+        if field.type is str:
+            values.append(b"")
+        elif isinstance(field.type, type) and issubclass(field.type, enum.IntFlag):
+            values.append(0)
+        elif isinstance(field.type, type) and issubclass(field.type, enum.IntEnum):
+            values.append(next(iter(field.type)).value)
+        else:
+            values.append(0)
+    return values
+
+
+def _register_map(rng: random.Random) -> array.array[int]:
+    registers = array.array("H", bytes(2 * (_END_ADDRESS + 1 - sunspec.BASE_ADDRESS)))
+
+    def put(address: int, data: bytes) -> None:
+        start = address - sunspec.BASE_ADDRESS
+        registers[start : start + len(data) // 2] = array.array(
+            "H", struct.unpack(f">{len(data) // 2}H", data)
+        )
+
+    put(sunspec.BASE_ADDRESS, b"SunS")
+    for (model_id, address, model), (_, next_address, _) in zip(
+        _CHAIN, [*_CHAIN[1:], (0xFFFF, _END_ADDRESS, None)], strict=True
+    ):
+        put(address - 1, struct.pack(">HH", model_id, next_address - address - 2))
+        if model is None:
+            continue
+        values = _default_values(model)
+        if model is sunspec.Common:
+            values = [b"E3/DC", b"", b"S10 E AI Simulated", b"", b"", 1]
+        put(address + 1, model.STRUCT.pack(*values))
+        if model is sunspec.LithiumIonBattery:
+            # A single string, following the fixed part.
+            put(
+                address + 1 + model.STRUCT.size // 2,
+                model.String.STRUCT.pack(*_default_values(model.String)),
+            )
+    put(_END_ADDRESS - 1, struct.pack(">HH", 0xFFFF, 0))
+
+    for address, field, low, high in _DYNAMIC_FIELDS:
+        model = next(model for _, a, model in _CHAIN if a == address)
+        assert model is not None  # noqa: S101
+        offset, _ = model.field_spans()[field]
+        value = rng.randint(low, high)
+        registers[address + 1 + offset - sunspec.BASE_ADDRESS] = value & 0xFFFF
+    return registers
+
+
+class SimulatedDevice:
+    def __init__(self, rng: random.Random, latency: float) -> None:
+        self._rng = rng
+        self._latency = latency
+        self._registers = _register_map(rng)
+        self._stepped_at = time.monotonic()
+        self._dynamic = [
+            (
+                address
+                + 1
+                + next(m for _, a, m in _CHAIN if a == address).field_spans()[field][0]
+                - sunspec.BASE_ADDRESS,
+                low,
+                high,
+            )
+            for address, field, low, high in _DYNAMIC_FIELDS
+        ]
+
+    def _step(self) -> None:
+        for index, low, high in self._dynamic:
+            value = struct.unpack(">h", struct.pack(">H", self._registers[index]))[0]
+            value += round(self._rng.gauss(0, (high - low) / 50))
+            self._registers[index] = min(max(value, low), high) & 0xFFFF
+
+    async def read(self, address: int, count: int) -> list[int]:
+        await asyncio.sleep(self._latency * self._rng.lognormvariate(0, 0.3))
+        if (now := time.monotonic()) - self._stepped_at >= 1:
+            self._stepped_at = now
+            self._step()
+        start = address - sunspec.BASE_ADDRESS
+        registers = self._registers[max(start, 0) : start + count].tolist()
+        return registers + [0] * (count - len(registers))
+
+
+async def _serve(count: int, latency: float, seed: int, conn: Connection) -> None:
+    rng = random.Random(seed)
+    servers: list[ModbusTcpServer] = []
+    for _ in range(count):
+        # Latency varies between devices, some of them sit behind slow links.
+        device = SimulatedDevice(
+            random.Random(rng.random()), rng.lognormvariate(math.log(latency), 0.5)
+        )
+        server = ModbusTcpServer(device.read)
+        await server.start("127.0.0.1", 0)
+        servers.append(server)
+    conn.send([server.port for server in servers])
+
+    # Serve until the parent process asks us to stop or goes away.
+    with contextlib.suppress(EOFError):
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+    for server in servers:
+        await server.stop()
+
+
+def _serve_process(count: int, latency: float, seed: int, conn: Connection) -> None:
+    asyncio.run(_serve(count, latency, seed, conn))
+
+
+@dataclasses.dataclass
+class StepResult:
+    devices: int
+    entities: int
+    setup_wall: float
+    setup_cpu: float
+    memory: int
+    refreshes: int
+    failures: int
+    cpu: float
+    duration: float
+    state_writes: int
+    state_changes: int
+    refresh_durations: list[float]
+    loop_lags: list[float]
+
+    @property
+    def setup_wall_per_entry(self) -> float:
+        return self.setup_wall / self.devices
+
+    @property
+    def setup_cpu_per_entry(self) -> float:
+        return self.setup_cpu / self.devices
+
+    @property
+    def memory_per_entry(self) -> float:
+        return self.memory / self.devices
+
+    @property
+    def cpu_per_refresh(self) -> float:
+        return self.cpu / max(self.refreshes, 1)
+
+    @property
+    def state_writes_per_refresh(self) -> float:
+        return self.state_writes / max(self.refreshes, 1)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return math.nan
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _start_hass(config_dir: str) -> HomeAssistant:
+    # A bare instance with nothing but HTTP, which this integration depends on, so
+    # that the measurements aren't skewed by unrelated integrations.
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    hass.config_entries = ConfigEntries(hass, {})
+    loader.async_setup(hass)
+    await bootstrap.async_load_base_functionality(hass)
+    hass.auth = await auth.auth_manager_from_config(hass, [], [])
+    assert await async_setup_component(hass, "homeassistant", {})  # noqa: S101
+    assert await async_setup_component(  # noqa: S101
+        hass,
+        "http",
+        {"http": {"server_host": "127.0.0.1", "server_port": _free_port()}},
+    )
+    await hass.async_start()
+    return hass
+
+
+async def _add_entry(hass: HomeAssistant, port: int) -> None:
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_HOST: f"127.0.0.1:{port}"}
+    )
+
+
+async def _run_step(ports: list[int], warmup: float, duration: float) -> StepResult:
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await _start_hass(config_dir)
+        entities_before = len(hass.states.async_all())
+
+        # The traced memory includes everything allocated while setting up entries,
+        # tracing slows down the setup but affects all device counts alike.
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        cpu_before = time.process_time()
+        wall_before = time.perf_counter()
+        for port in ports:
+            await _add_entry(hass, port)
+        await hass.async_block_till_done()
+        setup_wall = time.perf_counter() - wall_before
+        setup_cpu = time.process_time() - cpu_before
+        memory = tracemalloc.get_traced_memory()[0] - memory_before
+        tracemalloc.stop()
+
+        entries = hass.config_entries.async_entries(DOMAIN)
+        coordinators: list[E3dcCoordinator] = [
+            entry.runtime_data
+            for entry in entries
+            if entry.state is ConfigEntryState.LOADED
+        ]
+        if len(coordinators) != len(ports):
+            _LOGGER.warning(
+                "Only %d of %d entries loaded", len(coordinators), len(ports)
+            )
+        entities = len(hass.states.async_all()) - entities_before
+
+        await asyncio.sleep(warmup)
+
+        refresh_durations: list[float] = []
+        for coordinator in coordinators:
+
+            @callback
+            def on_refresh(coordinator: E3dcCoordinator = coordinator) -> None:
+                if coordinator.update_duration is not None:
+                    refresh_durations.append(coordinator.update_duration)
+
+            coordinator.async_add_listener(on_refresh)
+
+        state_changes = 0
+
+        @callback
+        def on_state_changed(_event: Event) -> None:
+            nonlocal state_changes
+            state_changes += 1
+
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, on_state_changed)
+
+        loop_lags: list[float] = []
+
+        async def measure_loop_lag() -> None:
+            loop = asyncio.get_running_loop()
+            while True:
+                start = loop.time()
+                await asyncio.sleep(_LOOP_LAG_INTERVAL)
+                loop_lags.append(loop.time() - start - _LOOP_LAG_INTERVAL)
+
+        lag_task = asyncio.create_task(measure_loop_lag())
+
+        def totals() -> tuple[int, int, int]:
+            return (
+                sum(c.update_count for c in coordinators),
+                sum(c.update_failures for c in coordinators),
+                sum(c.state_writes for c in coordinators),
+            )
+
+        refreshes_before, failures_before, writes_before = totals()
+        cpu_before = time.process_time()
+        await asyncio.sleep(duration)
+        cpu = time.process_time() - cpu_before
+        refreshes_after, failures_after, writes_after = totals()
+
+        lag_task.cancel()
+        unsub()
+        await hass.async_stop()
+
+    return StepResult(
+        devices=len(ports),
+        entities=entities,
+        setup_wall=setup_wall,
+        setup_cpu=setup_cpu,
+        memory=memory,
+        refreshes=refreshes_after - refreshes_before,
+        failures=failures_after - failures_before,
+        cpu=cpu,
+        duration=duration,
+        state_writes=writes_after - writes_before,
+        state_changes=state_changes,
+        refresh_durations=refresh_durations,
+        loop_lags=loop_lags,
+    )
+
+
+_COLUMNS = [
+    ("devices", "{:>7}", lambda r: r.devices),
+    ("entities", "{:>8}", lambda r: r.entities),
+    ("setup ms/entry", "{:>14.1f}", lambda r: 1e3 * r.setup_wall_per_entry),
+    ("setup cpu ms/entry", "{:>18.1f}", lambda r: 1e3 * r.setup_cpu_per_entry),
+    ("KiB/entry", "{:>9.1f}", lambda r: r.memory_per_entry / 1024),
+    ("refreshes", "{:>9}", lambda r: r.refreshes),
+    ("failures", "{:>8}", lambda r: r.failures),
+    ("cpu ms/refresh", "{:>14.2f}", lambda r: 1e3 * r.cpu_per_refresh),
+    ("cpu %", "{:>5.1f}", lambda r: 100 * r.cpu / r.duration),
+    (
+        "refresh p50 ms",
+        "{:>14.1f}",
+        lambda r: 1e3 * _percentile(r.refresh_durations, 50),
+    ),
+    (
+        "refresh p95 ms",
+        "{:>14.1f}",
+        lambda r: 1e3 * _percentile(r.refresh_durations, 95),
+    ),
+    ("writes/s", "{:>8.1f}", lambda r: r.state_writes / r.duration),
+    ("changes/s", "{:>9.1f}", lambda r: r.state_changes / r.duration),
+    ("lag p50 ms", "{:>10.2f}", lambda r: 1e3 * _percentile(r.loop_lags, 50)),
+    ("lag p99 ms", "{:>10.2f}", lambda r: 1e3 * _percentile(r.loop_lags, 99)),
+    ("lag max ms", "{:>10.2f}", lambda r: 1e3 * max(r.loop_lags, default=math.nan)),
+]
+
+# Costs that should not depend on the number of devices, with what they mostly cover.
+_PER_ENTRY_COSTS = [
+    ("setup cpu per entry", "entity construction", lambda r: r.setup_cpu_per_entry),
+    ("memory per entry", "coordinator and entities", lambda r: r.memory_per_entry),
+    ("cpu per refresh", "coordinator refresh", lambda r: r.cpu_per_refresh),
+    (
+        "state writes per refresh",
+        "sensor updates",
+        lambda r: r.state_writes_per_refresh,
+    ),
+]
+
+
+def _report(results: list[StepResult]) -> str:
+    lines = [
+        "  ".join(name for name, _, _ in _COLUMNS),
+        *(
+            "  ".join(fmt.format(value(result)) for _, fmt, value in _COLUMNS)
+            for result in results
+        ),
+        "",
+    ]
+
+    baseline = results[0]
+    for name, covers, value in _PER_ENTRY_COSTS:
+        base = value(baseline)
+        not_linear = [
+            result
+            for result in results[1:]
+            if base > 0 and value(result) / base > _LINEAR_TOLERANCE
+        ]
+        if not not_linear:
+            lines.append(f"{name} ({covers}): linear")
+            continue
+        first = not_linear[0]
+        lines.append(
+            f"{name} ({covers}): not linear from {first.devices} devices, "
+            f"{value(first) / base:.2f}x the cost at {baseline.devices}"
+        )
+    return "\n".join(lines)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    process = context.Process(
+        target=_serve_process,
+        args=(max(args.devices), args.latency / 1000, args.seed, child_conn),
+        daemon=True,
+    )
+    process.start()
+    ports: list[int] = await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+
+    results: list[StepResult] = []
+    try:
+        for devices in sorted(args.devices):
+            _LOGGER.info("Running with %d devices", devices)
+            results.append(await _run_step(ports[:devices], args.warmup, args.duration))
+    finally:
+        conn.send(None)
+        process.join(5)
+
+    print(_report(results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n")[0])
+    parser.add_argument(
+        "--devices",
+        type=int,
+        nargs="+",
+        default=[1, 5, 10, 25, 50],
+        help="numbers of simulated devices to test with",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=30,
+        help="median request latency of the simulated devices in ms",
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=15, help="seconds to wait before measuring"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=60, help="seconds to measure for"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+    _LOGGER.setLevel(logging.INFO)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
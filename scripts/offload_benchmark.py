@@ -0,0 +1,262 @@
+"""Benchmark how long the event loop is blocked by a refresh, with and without offload.
+
+A synthetic register map of a large installation, with many battery strings and MPPT
+trackers and both meters, is served by an in-process stand-in for the Modbus client.
+Every cycle reads the models and builds the snapshot the way the coordinator does,
+either on the event loop or on a snapshot of the client in a worker thread, like the
+`offload_decoding` option does. The following is reported per cycle:
+
+- wall: time from the first read to the finished snapshot.
+- loop busy: time the event loop spent running callbacks, reads included.
+- longest callback: the longest the event loop was blocked at a time, which delays
+  everything else running on it, like the state writes of other integrations.
+
+The worker thread still holds the GIL while decoding, so offloading doesn't save CPU
+time. It splits the work into slices the event loop can run in between.
+
+Usage: python scripts/offload_benchmark.py --strings 32 --trackers 16 --cycles 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import enum
+import functools
+import random
+import statistics
+import struct
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.e3dc.api import sunspec
+from custom_components.e3dc.coordinator import E3dcData, _decode_snapshot
+
+_FUSE_RATING = 35.0
+
+
+def _random_values(model: type[sunspec._Model], rng: random.Random) -> list[object]:
+    values: list[object] = []
+    for field in dataclasses.fields(model):
+        if field.default_factory is not dataclasses.MISSING:
+            continue
+        if field.type is str:
+            values.append(b"")
+        elif isinstance(field.type, type) and issubclass(field.type, enum.IntFlag):
+            values.append(0)
+        elif isinstance(field.type, type) and issubclass(field.type, enum.IntEnum):
+            values.append(next(iter(field.type)).value)
+        elif field.name.endswith("_sf"):
+            values.append(-1)
+        else:
+            values.append(rng.randint(0, 1000))
+    return values
+
+
+def _register_map(strings: int, trackers: int, rng: random.Random) -> list[int]:
+    data = bytearray(b"SunS")
+
+    def add(model_id: int, body: bytes) -> None:
+        data.extend(struct.pack(">HH", model_id, len(body) // 2) + body)
+
+    def pack(model: type[sunspec._Model]) -> bytes:
+        return model.STRUCT.pack(*_random_values(model, rng))
+
+    add(
+        1,
+        sunspec.Common.STRUCT.pack(b"E3/DC", b"", b"S10 E PRO Simulated", b"", b"", 1),
+    )
+    add(801, pack(sunspec.EnergyStorageBase))
+    add(802, pack(sunspec.BatteryBase))
+    battery = sunspec.LithiumIonBattery
+    add(803, pack(battery) + b"".join(pack(battery.String) for _ in range(strings)))
+    add(103, pack(sunspec.Inverter))
+    add(
+        160,
+        pack(sunspec.Mppt)
+        + b"".join(pack(sunspec.Mppt.Module) for _ in range(trackers)),
+    )
+    add(203, pack(sunspec.AbcnMeter))
+    add(203, pack(sunspec.AbcnMeter))
+    data.extend(struct.pack(">HH", 0xFFFF, 0))
+    return list(struct.unpack(f">{len(data) // 2}H", data))
+
+
+@dataclasses.dataclass(frozen=True)
+class _Response:
+    registers: list[int]
+
+    def isError(self) -> bool:  # noqa: N802
+        return False
+
+
+class _Client:
+    """Serves the register map in place of the Modbus client, after a delay."""
+
+    connected = True
+
+    def __init__(self, registers: list[int], latency: float) -> None:
+        self._registers = registers
+        self._latency = latency
+
+    async def read_holding_registers(self, address: int, *, count: int) -> _Response:
+        await asyncio.sleep(self._latency)
+        start = address - sunspec.BASE_ADDRESS
+        return _Response(self._registers[start : start + count])
+
+    def close(self) -> None:
+        pass
+
+
+@dataclasses.dataclass
+class _LoopMonitor:
+    """Times every callback the event loop runs."""
+
+    busy: float = 0.0
+    longest: float = 0.0
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator[None]:
+        run = asyncio.events.Handle._run  # noqa: SLF001
+
+        def timed_run(handle: asyncio.events.Handle) -> None:
+            start = time.perf_counter()
+            try:
+                run(handle)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.busy += elapsed
+                self.longest = max(self.longest, elapsed)
+
+        asyncio.events.Handle._run = timed_run  # noqa: SLF001
+        try:
+            yield
+        finally:
+            asyncio.events.Handle._run = run  # noqa: SLF001
+
+    def reset(self) -> None:
+        self.busy = self.longest = 0.0
+
+
+@dataclasses.dataclass
+class _Result:
+    wall: list[float] = dataclasses.field(default_factory=list)
+    busy: list[float] = dataclasses.field(default_factory=list)
+    longest: list[float] = dataclasses.field(default_factory=list)
+
+
+async def _refresh(
+    client: sunspec.E3dc,
+    ranges: list[sunspec.RegisterRange],
+    common: sunspec.Common,
+    generation: int,
+    *,
+    offload: bool,
+) -> E3dcData:
+    await client.read_ranges(ranges)
+    decode = functools.partial(
+        _decode_snapshot,
+        probed={},
+        generation=generation,
+        common=common,
+        read_times={},
+        fuse_rating=_FUSE_RATING,
+    )
+    if offload:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, decode, client.snapshot()
+        )
+    return decode(client)
+
+
+async def _run(
+    args: argparse.Namespace, registers: list[int], *, offload: bool
+) -> _Result:
+    client = sunspec.E3dc(_Client(registers, args.latency))
+    await client.scan_register_map()
+    common = await client.read_common()
+    # Every register of the models, as if all entities were enabled.
+    ranges = [
+        client.block_range(block)
+        for block in (
+            "storage",
+            "li_battery",
+            "inverter",
+            "mppt",
+            "root_meter",
+            "extra_meter",
+        )
+    ]
+    await client.read_ranges(ranges)
+
+    result = _Result()
+    monitor = _LoopMonitor()
+    with monitor.installed():
+        for generation in range(args.warmup + args.cycles):
+            monitor.reset()
+            start = time.perf_counter()
+            await _refresh(client, ranges, common, generation, offload=offload)
+            if generation < args.warmup:
+                continue
+            result.wall.append(time.perf_counter() - start)
+            result.busy.append(monitor.busy)
+            result.longest.append(monitor.longest)
+    return result
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+def _report(results: dict[str, _Result]) -> str:
+    header = (
+        f"{'mode':<8} {'wall [ms]':>10} {'loop busy [ms]':>15} "
+        f"{'p95':>7} {'longest callback [ms]':>22} {'p95':>7} {'max':>7}"
+    )
+    lines = [header]
+    for mode, result in results.items():
+        lines.append(
+            f"{mode:<8} {statistics.mean(result.wall) * 1e3:>10.3f} "
+            f"{statistics.mean(result.busy) * 1e3:>15.3f} "
+            f"{_percentile(result.busy, 95) * 1e3:>7.3f} "
+            f"{statistics.mean(result.longest) * 1e3:>22.3f} "
+            f"{_percentile(result.longest, 95) * 1e3:>7.3f} "
+            f"{max(result.longest) * 1e3:>7.3f}"
+        )
+    return "\n".join(lines)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    registers = _register_map(args.strings, args.trackers, random.Random(args.seed))
+    print(
+        f"{args.strings} battery strings, {args.trackers} trackers, "
+        f"{len(registers)} registers, {args.cycles} cycles"
+    )
+    results = {
+        "inline": await _run(args, registers, offload=False),
+        "offload": await _run(args, registers, offload=True),
+    }
+    print(_report(results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n")[0])
+    parser.add_argument("--strings", type=int, default=32)
+    parser.add_argument("--trackers", type=int, default=16)
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument(
+        "--warmup", type=int, default=10, help="cycles to run before measuring"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.002, help="seconds per read request"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
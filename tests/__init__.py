@@ -0,0 +1 @@
+"""Tests for the E3/DC integration."""
@@ -0,0 +1,149 @@
+import dataclasses
+import struct
+from collections.abc import Iterator, Sequence
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc.api import sunspec
+from custom_components.e3dc.const import DOMAIN
+
+
+def _put(registers: dict[int, int], address: int, data: bytes) -> None:
+    for offset, (value,) in enumerate(struct.iter_unpack(">H", data)):
+        registers[address + offset] = value
+
+
+def _block(model: type[sunspec._Model], values: dict[str, Any]) -> bytes:
+    # Unset fields are 1, a block of only 0 would be "not implemented". Unset scale
+    # factors are 0.
+    fields = [
+        field.name
+        for field in dataclasses.fields(model)
+        if field.default_factory is dataclasses.MISSING
+    ]
+    return model.STRUCT.pack(
+        *(values.get(field, 0 if field.endswith("_sf") else 1) for field in fields)
+    )
+
+
+def register_map() -> dict[int, int]:
+    """Register map of an S10 with a battery of one string and both meters.
+
+    The blocks have the lengths and addresses of the real device, which pads some of
+    them.
+    """
+    registers: dict[int, int] = {}
+    _put(registers, sunspec.BASE_ADDRESS, b"SunS")
+    # Model ID, address of the length register, length and data.
+    chain: list[tuple[int, int, int, bytes]] = [
+        (
+            1,
+            40003,
+            66,
+            sunspec.Common.STRUCT.pack(b"E3/DC", b"", b"S10 E AIO", b"", b"", 1),
+        ),
+        (801, 40071, 24, _block(sunspec.EnergyStorageBase, {"cha_st": 4})),
+        (802, 40097, 18, b""),
+        (
+            803,
+            40117,
+            32,
+            _block(sunspec.LithiumIonBattery, {"con_str_ct": 1})
+            + _block(sunspec.LithiumIonBattery.String, {}),
+        ),
+        (103, 40151, 50, _block(sunspec.Inverter, {"st": 4, "wh": 1000})),
+        (203, 40203, 105, _block(sunspec.AbcnMeter, {"w": 500, "tot_wh_imp": 2000})),
+        (203, 40310, 105, _block(sunspec.AbcnMeter, {"w": 200})),
+        (sunspec.END_MODEL_ID, 40417, 0, b""),
+    ]
+    for model_id, address, length, data in chain:
+        _put(registers, address - 1, struct.pack(">HH", model_id, length))
+        _put(registers, address + 1, data)
+    return registers
+
+
+def set_field(
+    registers: dict[int, int], block: sunspec.Block, field: str, value: int
+) -> None:
+    """Set a single register field of a block of the register map."""
+    model, address = sunspec.E3dc.BLOCKS[block]
+    offset, count = model.field_span(field)
+    _put(registers, address + 1 + offset, value.to_bytes(2 * count, "big"))
+
+
+async def setup_with_entities_disabled(
+    hass: HomeAssistant, entry: MockConfigEntry, options: dict[str, Any]
+) -> None:
+    """Set up the entry with the options and all of its entities disabled."""
+    hass.config_entries.async_update_entry(entry, options=options)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    entity_registry = er.async_get(hass)
+    for entity in er.async_entries_for_config_entry(entity_registry, entry.entry_id):
+        entity_registry.async_update_entity(
+            entity.entity_id, disabled_by=er.RegistryEntryDisabler.USER
+        )
+    assert await hass.config_entries.async_reload(entry.entry_id)
+    await hass.async_block_till_done()
+    assert not list(entry.runtime_data.async_contexts())
+
+
+@dataclasses.dataclass
+class _Response:
+    registers: list[int]
+
+    def isError(self) -> bool:  # noqa: N802
+        return False
+
+
+class FakeModbusClient:
+    """Serves a register map in place of `AsyncModbusTcpClient`."""
+
+    def __init__(self, registers: dict[int, int]) -> None:
+        self.registers = registers
+        self.connected = False
+        self.reads: list[sunspec.RegisterRange] = []
+
+    async def connect(self) -> bool:
+        self.connected = True
+        return True
+
+    def close(self) -> None:
+        self.connected = False
+
+    async def read_holding_registers(self, address: int, *, count: int) -> _Response:
+        self.reads.append((address, count))
+        return _Response(
+            [self.registers.get(a, 0) for a in range(address, address + count)]
+        )
+
+    async def write_registers(self, address: int, values: Sequence[int]) -> _Response:
+        for offset, value in enumerate(values):
+            self.registers[address + offset] = value
+        return _Response([])
+
+
+@pytest.fixture
+def modbus_client() -> Iterator[FakeModbusClient]:
+    client = FakeModbusClient(register_map())
+    with patch(
+        "custom_components.e3dc.api.sunspec.AsyncModbusTcpClient",
+        lambda *_args, **_kwargs: client,
+    ):
+        yield client
+
+
+@pytest.fixture
+def config_entry(
+    hass: HomeAssistant,
+    enable_custom_integrations: None,  # noqa: ARG001
+) -> MockConfigEntry:
+    entry = MockConfigEntry(domain=DOMAIN, title="S10", data={CONF_HOST: "192.0.2.1"})
+    entry.add_to_hass(hass)
+    return entry
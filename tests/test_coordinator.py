@@ -0,0 +1,43 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc.const import CONF_EXPORT, CONF_METRICS
+
+from .conftest import FakeModbusClient, set_field, setup_with_entities_disabled
+
+
+@pytest.mark.parametrize("options", [{CONF_METRICS: True}, {CONF_EXPORT: True}])
+async def test_recorded_fields_are_read(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,
+    options: dict[str, Any],
+    tmp_path: Path,
+) -> None:
+    # The export writes to the config directory.
+    hass.config.config_dir = str(tmp_path)
+    await setup_with_entities_disabled(hass, config_entry, options)
+    coordinator = config_entry.runtime_data
+
+    set_field(modbus_client.registers, "inverter", "tmp_cab", 45)
+    set_field(modbus_client.registers, "li_battery", "strings.0.max_cell_vol", 3300)
+    await coordinator.async_refresh()
+    assert coordinator.data.inverter.tmp_cab == 45
+    assert coordinator.data.li_battery.strings[0].max_cell_vol == 3300
+
+
+async def test_unrecorded_fields_are_not_read(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,
+) -> None:
+    await setup_with_entities_disabled(hass, config_entry, {})
+    coordinator = config_entry.runtime_data
+
+    set_field(modbus_client.registers, "inverter", "tmp_cab", 45)
+    await coordinator.async_refresh()
+    assert coordinator.data.inverter.tmp_cab == 1
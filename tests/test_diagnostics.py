@@ -0,0 +1,30 @@
+import pytest
+from homeassistant.components.diagnostics import REDACTED
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc.const import CONF_SSDP_UDN, DOMAIN
+from custom_components.e3dc.diagnostics import async_get_config_entry_diagnostics
+
+_UDN = "uuid:00000000-0000-0000-0000-000000000000"
+
+
+@pytest.mark.usefixtures("modbus_client", "enable_custom_integrations")
+async def test_identifiers_are_redacted(hass: HomeAssistant) -> None:
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="S10",
+        data={CONF_HOST: "192.0.2.1", CONF_SSDP_UDN: _UDN},
+        unique_id=_UDN,
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["entry"]["unique_id"] == REDACTED
+    assert diagnostics["entry"]["data"] == {
+        CONF_HOST: REDACTED,
+        CONF_SSDP_UDN: REDACTED,
+    }
+    assert _UDN not in str(diagnostics)
@@ -0,0 +1,57 @@
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc import external_statistics
+from custom_components.e3dc.const import CONF_IMPORT_STATISTICS
+
+from .conftest import FakeModbusClient, set_field, setup_with_entities_disabled
+
+
+@pytest.mark.usefixtures("recorder_mock")
+async def test_import_with_sensors_disabled(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,
+) -> None:
+    await setup_with_entities_disabled(
+        hass, config_entry, {CONF_IMPORT_STATISTICS: True}
+    )
+    coordinator = config_entry.runtime_data
+
+    set_field(modbus_client.registers, "root_meter", "tot_wh_imp", 2500)
+    await coordinator.async_refresh()
+    assert coordinator.data.root_meter.tot_wh_imp == 2500
+
+    statistics = coordinator._statistics
+    assert statistics is not None
+    statistic_id = f"e3dc:{config_entry.entry_id.lower()}_root_meter_tot_wh_imp"
+    assert statistics._sums[statistic_id].sum == 500
+
+
+async def test_stale_samples_are_skipped(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,  # noqa: ARG001
+) -> None:
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    data = config_entry.runtime_data.data
+    importer = external_statistics.StatisticsImporter(
+        hass, config_entry.entry_id, "S10"
+    )
+    statistic_id = f"e3dc:{config_entry.entry_id.lower()}_root_meter_w"
+    start = datetime(2026, 1, 1, 10, tzinfo=UTC)
+
+    def read_time(block: str, _field: str) -> float:
+        # Only the inverter was read again.
+        return 2.0 if block == "inverter" else 1.0
+
+    with patch.object(external_statistics, "async_add_external_statistics"):
+        importer.add_sample(data, start, lambda _block, _field: 1.0)
+        importer.add_sample(data, start + timedelta(minutes=10), read_time)
+    mean = importer._means[statistic_id]
+    assert mean.last_at == start.timestamp()
+    assert mean.duration == 0
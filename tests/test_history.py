@@ -0,0 +1,29 @@
+import math
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc.const import CONF_HISTORY_SIZE
+
+from .conftest import FakeModbusClient, setup_with_entities_disabled
+
+
+async def test_unread_fields_are_nan(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,  # noqa: ARG001
+) -> None:
+    await setup_with_entities_disabled(hass, config_entry, {CONF_HISTORY_SIZE: 10})
+    coordinator = config_entry.runtime_data
+    await coordinator.async_refresh()
+
+    history = coordinator.history
+    assert history is not None
+    _, columns = history.query(
+        0, math.inf, ["root_meter.w", "inverter.tmp_cab", "inverter.st"]
+    )
+    # Read in full by the first refresh, later only the fields for the poll interval.
+    assert list(columns["root_meter.w"]) == [500, 500]
+    assert list(columns["inverter.st"]) == [4, 4]
+    assert columns["inverter.tmp_cab"][0] == 1
+    assert math.isnan(columns["inverter.tmp_cab"][1])
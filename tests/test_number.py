@@ -0,0 +1,39 @@
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .conftest import FakeModbusClient, set_field
+
+
+async def test_invalid_setpoint_writes_nothing(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,
+) -> None:
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    coordinator = config_entry.runtime_data
+    registers = dict(modbus_client.registers)
+
+    with pytest.raises(ServiceValidationError):
+        await coordinator.async_write_storage(
+            {"w_max_cha_rte": 3000, "soc_np_max_pct": 70000}
+        )
+    await coordinator.async_write_storage({"soc_np_min_pct": 10})
+    await hass.async_block_till_done()
+    set_field(registers, "storage", "soc_np_min_pct", 10)
+    assert modbus_client.registers == registers
+
+
+async def test_max_value_fits_the_register(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    modbus_client: FakeModbusClient,
+) -> None:
+    set_field(modbus_client.registers, "storage", "w_max_cha_dis_cha_sf", 0)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("number.s10_charge_power_limit")
+    assert state is not None
+    assert state.attributes["max"] == 0xFFFF
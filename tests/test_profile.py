@@ -0,0 +1,30 @@
+import asyncio
+import cProfile
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+
+@pytest.mark.usefixtures("modbus_client")
+async def test_refresh_with_another_profiler_active(
+    hass: HomeAssistant, config_entry: MockConfigEntry
+) -> None:
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    coordinator = config_entry.runtime_data
+    update_count = coordinator.update_count
+
+    profile = hass.async_create_task(coordinator.async_profile(1))
+    await asyncio.sleep(0)
+    other = cProfile.Profile()
+    other.enable()
+    try:
+        await coordinator.async_refresh()
+    finally:
+        other.disable()
+
+    with pytest.raises(HomeAssistantError):
+        await profile
+    assert coordinator.update_count == update_count + 1
+    assert coordinator.last_update_success
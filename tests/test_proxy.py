@@ -0,0 +1,66 @@
+import asyncio
+import socket
+import struct
+from collections.abc import Iterator
+
+import pytest
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc.const import CONF_PROXY_PORT
+
+pytestmark = pytest.mark.usefixtures("socket_enabled", "modbus_client")
+
+
+@pytest.fixture
+def busy_port() -> Iterator[int]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        yield sock.getsockname()[1]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _read_holding_registers(port: int, address: int, count: int) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(struct.pack(">HHHBBHH", 1, 0, 6, 1, 0x03, address, count))
+        (length,) = struct.unpack(">4xH", await reader.readexactly(6))
+        return (await reader.readexactly(length))[1:]
+    finally:
+        writer.close()
+
+
+async def test_busy_port(
+    hass: HomeAssistant, config_entry: MockConfigEntry, busy_port: int
+) -> None:
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_PROXY_PORT: busy_port}
+    )
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    assert config_entry.state is ConfigEntryState.LOADED
+
+
+async def test_reads_while_reconnecting(
+    hass: HomeAssistant, config_entry: MockConfigEntry
+) -> None:
+    port = _free_port()
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_PROXY_PORT: port}
+    )
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+
+    response = await _read_holding_registers(port, 40000, 2)
+    assert response == b"\x03\x04SunS"
+
+    coordinator = config_entry.runtime_data
+    client, coordinator._client = coordinator._client, None
+    response = await _read_holding_registers(port, 40000, 2)
+    assert response == b"\x83\x04"
+    coordinator._client = client
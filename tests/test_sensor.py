@@ -0,0 +1,29 @@
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.e3dc.const import DOMAIN
+
+
+@pytest.mark.usefixtures("modbus_client")
+async def test_battery_energy_on_battery_device(
+    hass: HomeAssistant,
+    entity_registry: er.EntityRegistry,
+    device_registry: dr.DeviceRegistry,
+    config_entry: MockConfigEntry,
+) -> None:
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    battery = device_registry.async_get_device(
+        {(DOMAIN, f"{config_entry.entry_id}_battery")}
+    )
+    assert battery is not None
+    for key in ("battery_energy_charged", "battery_energy_discharged"):
+        entity_id = entity_registry.async_get_entity_id(
+            "sensor", DOMAIN, f"{config_entry.entry_id}_{key}_battery"
+        )
+        assert entity_id is not None
+        assert entity_registry.async_get(entity_id).device_id == battery.id